@@ -0,0 +1,45 @@
+import random
+import threading
+import time
+
+class RetryPolicy:
+    """Jittered exponential backoff per key, with a circuit breaker that parks repeatedly failing keys.
+
+    Each consecutive failure doubles the delay (base, 2*base, 4*base, ... up
+    to cap), randomised to between half and all of it so repositories that
+    failed together do not retry in lockstep. After threshold consecutive
+    failures the key is parked for park_seconds instead; the next attempt
+    after that is a single probe that either closes the breaker or parks the
+    key again. Thresholds are passed per call so module constants can change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._parked_until = {}
+
+    def failure(self, key, base, cap, threshold=None, park_seconds=None):
+        """Record a failure for key and return how many seconds to wait before retrying it."""
+        with self._lock:
+            count = self._failures[key] = self._failures.get(key, 0) + 1
+            if threshold and park_seconds and count >= threshold:
+                self._parked_until[key] = time.time() + park_seconds
+                return park_seconds
+            delay = min(cap, base * 2 ** (count - 1))
+            return delay / 2 + random.uniform(0, delay / 2)
+
+    def success(self, key):
+        """Reset key after a successful attempt (closing its breaker)."""
+        with self._lock:
+            self._failures.pop(key, None)
+            self._parked_until.pop(key, None)
+
+    def failures(self, key):
+        """Return the number of consecutive failures recorded for key."""
+        with self._lock:
+            return self._failures.get(key, 0)
+
+    def parked(self, key):
+        """True while key's breaker is open."""
+        with self._lock:
+            return self._parked_until.get(key, 0) > time.time()
@@ -0,0 +1,249 @@
+"""Offline throughput benchmark for bot.py and bot2.py.
+
+Builds local bare "remote" repositories with a chosen history size and
+working-tree file count, clones them, then drives the commit cycle of each
+bot directly (no scheduler, so no sleeps) and writes the results as JSON.
+
+    python benchmark.py --repos 4 --history 100 2000 --files 50 500 --commits 50 \\
+        --backend porcelain plumbing --layout flat sharded --output bench.json
+
+Every combination of --history, --files, --backend, --layout and
+--batch-size is run on freshly built fixtures.
+"""
+import argparse
+import collections
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import bot
+import bot2
+import metrics
+from metrics import registry
+
+# Identity for fixture and benchmark commits, independent of the user's git config
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "Benchmark", "GIT_AUTHOR_EMAIL": "bench@example.invalid",
+    "GIT_COMMITTER_NAME": "Benchmark", "GIT_COMMITTER_EMAIL": "bench@example.invalid",
+}
+
+# Outcomes that leave a new commit behind; failed, skipped, postponed and timed-out attempts do not count
+COMMITTED = ("committed", "deferred", "recovered")
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+def _fast_import_stream(history, files):
+    """Yield a fast-import stream: one commit adding files, then history-1 small commits."""
+    def data(text):
+        raw = text.encode("utf-8")
+        return b"data %d\n%s\n" % (len(raw), raw)
+
+    stamp = int(time.time()) - history * 60
+    for n in range(max(1, history)):
+        out = io.BytesIO()
+        out.write(b"commit refs/heads/main\n")
+        out.write(b"committer Benchmark <bench@example.invalid> %d +0000\n" % (stamp + n * 60))
+        out.write(data(f"Fixture commit {n}"))
+        if n == 0:
+            for i in range(files):
+                out.write(f"M 100644 inline src/file_{i:05d}.txt\n".encode())
+                out.write(data(f"fixture file {i}\n"))
+        out.write(b"M 100644 inline history.txt\n")
+        out.write(data(f"history step {n}\n"))
+        yield out.getvalue()
+
+def build_remote(path, history, files):
+    """Create a bare repository at path with the requested history size and file count."""
+    subprocess.run(["git", "init", "--quiet", "--bare", path], check=True)
+    proc = subprocess.Popen(["git", "fast-import", "--quiet"], cwd=path, stdin=subprocess.PIPE)
+    for chunk in _fast_import_stream(history, files):
+        proc.stdin.write(chunk)
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError(f"fast-import failed for {path}")
+    subprocess.run(["git", "symbolic-ref", "HEAD", "refs/heads/main"], cwd=path, check=True)
+    subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=path, check=True)
+
+def build_fixtures(workdir, repos, history, files):
+    """Build repos bare remotes under workdir/remotes and return their file:// URLs."""
+    remotes = os.path.join(workdir, "remotes")
+    os.makedirs(remotes, exist_ok=True)
+    urls = []
+    for k in range(repos):
+        path = os.path.join(remotes, f"repo{k:03d}.git")
+        build_remote(path, history, files)
+        urls.append("file://" + path)
+    return urls
+
+def _summarize(name, combo, latencies, wall, statuses, subprocesses, disk_before, disk_after):
+    """Build a result row; rates are per commit actually made, with every attempt's outcome reported alongside."""
+    commits = sum(1 for status in statuses if status in COMMITTED)
+    return {
+        "bot": name, **combo,
+        "attempts": len(statuses),
+        "commits": commits,
+        "failures": len(statuses) - commits,
+        "outcomes": dict(sorted(collections.Counter(statuses).items())),
+        "wall_seconds": round(wall, 4),
+        "commits_per_second": round(commits / wall, 3) if wall else None,
+        "latency_p50_seconds": _percentile(latencies, 50),
+        "latency_p95_seconds": _percentile(latencies, 95),
+        "subprocesses_per_commit": round(subprocesses / commits, 2) if commits else None,
+        "disk_growth_bytes_per_1000_commits": round((disk_after - disk_before) / commits * 1000) if commits else None,
+    }
+
+def bench_bot(workdir, url, combo, commits):
+    """Drive bot.make_commit against one clone and return its result row."""
+    clone = os.path.join(workdir, "bot", "clone")
+    subprocess.run(["git", "clone", "--quiet", url, clone], check=True)
+    bot.REPO_PATH = clone
+    bot.LOG_FILE = os.path.join(workdir, "bot", "bot_log.txt")
+    bot.REPO_STATE_FILE = os.path.join(workdir, "bot", "state.json")
+    bot.GIT_BACKEND = combo["backend"]
+    bot.STORAGE_LAYOUT = combo["layout"]
+    bot.BATCH_SIZE = combo["batch_size"]
+
+    remote = url[len("file://"):]
+    disk_before = _dir_size(os.path.join(clone, ".git")) + _dir_size(remote)
+    registry.reset()
+    latencies = []
+    started = time.monotonic()
+    statuses = []
+    for _ in range(commits):
+        t0 = time.monotonic()
+        try:
+            statuses.append(bot.make_commit())
+        except Exception:  # bot.py's make_commit raises where bot2 returns "failed"
+            statuses.append("failed")
+        latencies.append(time.monotonic() - t0)
+    bot.flush_pending()
+    wall = time.monotonic() - started
+    disk_after = _dir_size(os.path.join(clone, ".git")) + _dir_size(remote)
+    subprocesses = registry.counter_total("bot_subprocess_total")
+    return _summarize("bot", combo, latencies, wall, statuses, subprocesses, disk_before, disk_after)
+
+def bench_bot2(workdir, urls, combo, rounds, workers):
+    """Drive bot2.run_cycle over every fixture repository and return its result row."""
+    base = os.path.join(workdir, "bot2")
+    os.makedirs(base, exist_ok=True)
+    bot2.BASE_PATH = base
+    bot2.LOG_FILE = os.path.join(base, "multi_repo_bot_log.txt")
+    bot2.REPO_STATE_FILE = os.path.join(base, "state.json")
+    bot2.SHARED_OBJECTS_PATH = os.path.join(base, ".shared-objects.git")
+    bot2.METRICS_PROM_FILE = bot2.METRICS_JSON_FILE = None
+    bot2.GIT_BACKEND = combo["backend"]
+    bot2.STORAGE_LAYOUT = combo["layout"]
+    bot2.BATCH_SIZE = combo["batch_size"]
+    bot2.CLONE_STRATEGY = combo["clone"]
+    bot2.REPOSITORIES = [
+        {"url": url, "name": f"repo{k:03d}", "dummy_file": "dummy_file_{}.txt"} for k, url in enumerate(urls)
+    ]
+    # Provision clones up front so clone time is not counted as commit latency
+    for repo in bot2.REPOSITORIES:
+        if not bot2.clone_repo_if_needed(repo):
+            raise RuntimeError(f"Could not clone {repo['url']}")
+
+    remotes = [url[len("file://"):] for url in urls]
+    clones = [os.path.join(base, repo["name"], ".git") for repo in bot2.REPOSITORIES]
+    disk_before = sum(map(_dir_size, remotes + clones))
+    registry.reset()
+    started = time.monotonic()
+    statuses = []
+    for _ in range(rounds):
+        statuses += bot2.run_cycle(bot2.REPOSITORIES, workers)["results"].values()
+    bot2.flush_pending()
+    wall = time.monotonic() - started
+    disk_after = sum(map(_dir_size, remotes + clones))
+    latencies = registry.samples("bot_commit_latency_seconds")
+    subprocesses = registry.counter_total("bot_subprocess_total")
+    row = _summarize("bot2", combo, latencies, wall, statuses, subprocesses, disk_before, disk_after)
+    row["workers"] = workers
+    return row
+
+def git_version():
+    return subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repos", type=int, default=4, help="fixture repositories for bot2 (default 4)")
+    parser.add_argument("--history", nargs="+", type=int, default=[500], help="commits of pre-existing history per repo")
+    parser.add_argument("--files", nargs="+", type=int, default=[200], help="files in each fixture working tree")
+    parser.add_argument("--commits", type=int, default=30, help="commits per repository to measure")
+    parser.add_argument("--bot", choices=["bot", "bot2", "both"], default="both")
+    parser.add_argument("--backend", nargs="+", default=["porcelain"], choices=["porcelain", "plumbing"])
+    parser.add_argument("--layout", nargs="+", default=["flat"], choices=["flat", "sharded"])
+    parser.add_argument("--batch-size", nargs="+", type=int, default=[1])
+    parser.add_argument("--clone", default="{}", help='bot2 clone strategy as JSON, e.g. \'{"depth": 1}\'')
+    parser.add_argument("--workers", type=int, default=bot2.MAX_WORKERS)
+    parser.add_argument("--workdir", help="keep fixtures here instead of a temporary directory")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    os.environ.update(GIT_IDENTITY)
+    os.environ["GIT_TERMINAL_PROMPT"] = "0"
+    metrics.SAMPLE_WINDOW = max(metrics.SAMPLE_WINDOW, args.commits * args.repos)
+    clone_strategy = json.loads(args.clone)
+
+    root = args.workdir or tempfile.mkdtemp(prefix="commit-bot-bench-")
+    results = []
+    try:
+        matrix = itertools.product(args.history, args.files, args.backend, args.layout, args.batch_size)
+        for n, (history, files, backend, layout, batch_size) in enumerate(matrix):
+            combo = {"history": history, "files": files, "backend": backend, "layout": layout, "batch_size": batch_size}
+            workdir = os.path.join(root, f"run{n:02d}")
+            os.makedirs(workdir, exist_ok=True)
+            # Bot output is very chatty; keep it out of the benchmark report
+            with contextlib.redirect_stdout(io.StringIO()):
+                if args.bot in ("bot", "both"):
+                    url = build_fixtures(os.path.join(workdir, "bot-fixtures"), 1, history, files)[0]
+                    results.append(bench_bot(workdir, url, combo, args.commits))
+                if args.bot in ("bot2", "both"):
+                    urls = build_fixtures(os.path.join(workdir, "bot2-fixtures"), args.repos, history, files)
+                    results.append(bench_bot2(workdir, urls, {**combo, "clone": clone_strategy}, args.commits, args.workers))
+            for row in results[-2 if args.bot == "both" else -1:]:
+                print(
+                    f"{row['bot']:5} history={history} files={files} {backend:9} {layout:7} batch={batch_size}: "
+                    f"{row['commits_per_second']} commits/s, p50 {row['latency_p50_seconds']:.3f}s, "
+                    f"p95 {row['latency_p95_seconds']:.3f}s, {row['subprocesses_per_commit']} subprocesses/commit, "
+                    f"{row['disk_growth_bytes_per_1000_commits']} B/1000 commits, "
+                    f"{row['failures']}/{row['attempts']} attempts without a commit"
+                )
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "environment": {"python": platform.python_version(), "git": git_version(), "platform": platform.platform()},
+        "fixtures": {"repos": args.repos, "commits": args.commits},
+        "results": results,
+    }
+    with open(args.output, 'w', encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
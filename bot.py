@@ -4,10 +4,42 @@ import subprocess
 import time
 from datetime import datetime
 
+import bot_logger
+import git_exec
+import maintenance
+import repo_state
+from backoff import RetryPolicy
+from git_backend import (
+    PLUMBING, PORCELAIN, commit_files, count_unpushed, oldest_unpushed_time, rebuild_on_upstream,
+    register_merge_drivers, resolve, staged_changes,
+)
+from metrics import registry
+from push_batcher import PushBatcher
+from scheduler import CATCH_UP_ONCE, DeadlineScheduler
+from storage_layout import FLAT, SHARDED, current_segment, split_name
+
 # Configuration
 REPO_PATH = "/Users/app/Documents/git"  # Your repo path
 FILE_NAME = "commit_log.txt"  # File to modify
+STORAGE_LAYOUT = FLAT  # FLAT (append to FILE_NAME forever) or SHARDED (size-capped commit_log/YYYY/MM/DD-NNN.txt)
 LOG_FILE = "/Users/app/Documents/git_bot_log.txt"  # Log file outside the repo
+LOG_FORMAT = bot_logger.TEXT  # TEXT, or JSON for one object per line with repo/phase/duration fields
+GIT_BACKEND = PORCELAIN  # PORCELAIN (status/add/commit) or PLUMBING (commit straight onto HEAD)
+BATCH_SIZE = 1  # Local commits to accumulate before one fetch+rebase+push (1 = push every commit)
+BATCH_WINDOW_SECONDS = None  # Also push once the oldest unpushed commit is this old, even between commits (None = size only)
+COMMIT_INTERVAL_SECONDS = 21600  # Time between commits (6 hours)
+ERROR_RETRY_SECONDS = 300  # First retry after a failed cycle; doubles (with jitter) on each further failure
+BACKOFF_MAX_SECONDS = 3600  # Cap on that retry delay
+BREAKER_THRESHOLD = 5  # Consecutive failures before the repository is parked
+BREAKER_PARK_SECONDS = 21600  # How long a parked repository waits before one probe attempt
+COMMAND_TIMEOUT_SECONDS = 120  # Kill (with its process group) any git command running longer than this
+CYCLE_TIMEOUT_SECONDS = 600  # Budget for one whole commit cycle, shared by all of its git commands
+SCHEDULE_STATE_FILE = "/Users/app/Documents/git_bot_schedule.json"  # Next-due time, kept across restarts
+CATCH_UP_POLICY = CATCH_UP_ONCE  # What to do with commits missed while the bot was down
+REPO_STATE_FILE = "/Users/app/Documents/git_bot_state.json"  # Last known HEAD / remote ref / push time
+METRICS_PROM_FILE = "/Users/app/Documents/git_bot_metrics.prom"  # Prometheus text file (None to disable)
+METRICS_JSON_FILE = "/Users/app/Documents/git_bot_metrics.json"  # JSON summary (None to disable)
+MAINTENANCE_ENABLED = True  # Replace auto-gc with idle-time repacks, commit-graph / multi-pack-index and periodic gc (see maintenance.py)
 COMMIT_MESSAGES = [
     "Add hourly update",
     "Update log file",
@@ -16,98 +48,253 @@ COMMIT_MESSAGES = [
     "Automated commit"
 ]
 
-def log_message(message):
-    """Append a message to the log file with a timestamp."""
-    with open(LOG_FILE, 'a') as f:
-        f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
+def log_message(message, phase=None, duration=None):
+    """Queue a timestamped message for the background log writer and echo it."""
+    # JSON lines name the repository like bot2's do; the text log keeps its original format
+    repo = os.path.basename(REPO_PATH) if LOG_FORMAT == bot_logger.JSON else None
+    bot_logger.get_writer(LOG_FILE, LOG_FORMAT).log(message, repo=repo, phase=phase, duration=duration)
     print(message)
 
 def git_command(cmd):
     """Run a git command in the repo directory and handle errors."""
+    phase = cmd.split()[1] if cmd.startswith("git ") else cmd
+    started = time.monotonic()
     try:
-        result = subprocess.run(
-            cmd, cwd=REPO_PATH, shell=True, capture_output=True, text=True, check=True
-        )
-        log_message(f"Command '{cmd}' output: {result.stdout.strip()}")
+        result = git_exec.run(cmd, REPO_PATH, shell=True)
+        duration = time.monotonic() - started
+        registry.record_subprocess(phase, os.path.basename(REPO_PATH), duration, result.returncode)
+        log_message(f"Command '{cmd}' output: {bot_logger.summarize_output(result.stdout.strip())}",
+                    phase=phase, duration=duration)
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
-        log_message(f"Error running command: {cmd}\nSTDERR: {e.stderr}")
+        duration = time.monotonic() - started
+        registry.record_subprocess(phase, os.path.basename(REPO_PATH), duration, e.returncode)
+        log_message(f"Error running command: {cmd} (exit {e.returncode})\nSTDERR: {e.stderr.strip()}",
+                    phase=phase, duration=duration)
+        raise
+    except subprocess.TimeoutExpired:
+        duration = time.monotonic() - started
+        registry.record_subprocess(phase, os.path.basename(REPO_PATH), duration, None)
+        log_message(f"Timed out after {duration:.0f}s, killed: {cmd}", phase=phase, duration=duration)
         raise
 
-def make_commit():
-    """Generate unique content, commit, and push to GitHub."""
-    file_path = os.path.join(REPO_PATH, FILE_NAME)
-    
-    # Generate unique content with timestamp and random value
-    content = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Random Value: {random.randint(1000, 9999)}\n"
-    
-    # Append content to file
-    with open(file_path, 'a') as f:
-        f.write(content)
-    log_message(f"Wrote content to {file_path}: {content.strip()}")
+_batcher = PushBatcher()
+_retry = RetryPolicy()
 
+def append_only_patterns():
+    """Return gitattributes patterns for the log files the bot only ever appends to."""
+    stem, _ = split_name(FILE_NAME)
+    return [f"/{FILE_NAME}", f"/{stem}/**"]
+
+def record_sync():
+    """Remember where HEAD and the upstream ref stand right after a successful push."""
+    repo_state.get_index(REPO_STATE_FILE).update(
+        REPO_PATH, local_head=resolve(REPO_PATH, "HEAD"),
+        remote_ref=resolve(REPO_PATH, "@{upstream}"), last_push=time.time()
+    )
+
+def sync_with_remote():
+    """Push all pending local commits, fetching and rebasing only when the remote has moved."""
+    # Push optimistically: a rejection means the remote moved, so rebase onto it and push once more
+    repo = os.path.basename(REPO_PATH)
+    log_message(f"Pushing {_batcher.pending(REPO_PATH)} local commit(s) to GitHub...")
     try:
-        # Check git status
-        log_message("Checking git status...")
-        git_command("git status")
+        with registry.span("push", repo):
+            git_command("git push")
+    except subprocess.CalledProcessError:
+        log_message("Push rejected. Pulling with rebase to sync with remote...")
+        registry.inc("bot_retries_total", repo=repo, reason="push_rejected")
+        with registry.span("pull", repo):
+            git_command("git pull --rebase")
+        with registry.span("push", repo):
+            git_command("git push")
+    _batcher.clear(REPO_PATH)
+    record_sync()
 
-        # Stage all modified files
-        log_message("Adding all modified files to commit...")
-        git_command("git add .")
+def seed_pending():
+    """Pick up commits a previous run left unpushed (@{upstream}..HEAD) so they join the next batch."""
+    _batcher.seed(REPO_PATH, count_unpushed(REPO_PATH), oldest_unpushed_time(REPO_PATH))
 
-        # Commit changes (even if log file was modified)
-        log_message("Adding all modified files again to ensure all changes are staged...")
-        git_command("git add .")  # Double-add to catch any last-second changes
+def next_flush():
+    """Return when the batch window runs out for the pending commits (None if not ahead of now)."""
+    at = _batcher.flush_deadline(REPO_PATH, BATCH_WINDOW_SECONDS)
+    return at if at is not None and at > time.time() else None
 
-        # Check if there are changes to commit
-        status = git_command("git status")
-        if "nothing to commit" in status:
-            log_message("No changes to commit. Skipping.")
-            return
+def flush_pending(due_only=False):
+    """Push commits held back by batching: all of them on shutdown, or with due_only those whose batch is due."""
+    if due_only and not _batcher.is_due(REPO_PATH, BATCH_SIZE, BATCH_WINDOW_SECONDS):
+        return
+    if not _batcher.pending(REPO_PATH):
+        return
+    try:
+        with git_exec.limits(time.monotonic() + CYCLE_TIMEOUT_SECONDS, COMMAND_TIMEOUT_SECONDS):
+            sync_with_remote()
+        log_message("✅ Pushed batched commits (batch window elapsed)." if due_only
+                    else "✅ Flushed pending commits before exit.")
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        log_message(f"Could not flush pending commits: {e}. They stay committed locally.")
 
-        # Commit changes
-        commit_msg = random.choice(COMMIT_MESSAGES)
-        log_message(f"Committing with message: {commit_msg}")
-        git_command(f'git commit -m "{commit_msg}"')
+def make_commit():
+    """Generate unique content, commit, and push to GitHub.
 
-        # Pull with rebase to sync with remote
-        log_message("Pulling with rebase to sync with remote...")
-        git_command("git pull --rebase")
+    Returns one of "committed", "deferred", "recovered" or "skipped".
+    """
+    repo = os.path.basename(REPO_PATH)
+    with registry.span("content", repo):
+        # Generate unique content with timestamp and random value
+        content = f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - Random Value: {random.randint(1000, 9999)}\n"
+        
+        # Append to the single log file, or to the current dated segment so blob and tree sizes stay bounded
+        if STORAGE_LAYOUT == SHARDED:
+            stem, ext = split_name(FILE_NAME)
+            rel_path = current_segment(REPO_PATH, stem, len(content.encode("utf-8")), ext=ext)
+        else:
+            rel_path = FILE_NAME
+        file_path = os.path.join(REPO_PATH, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        
+        # Append content to file
+        with open(file_path, 'a') as f:
+            f.write(content)
+    log_message(f"Wrote content to {file_path}: {content.strip()}")
 
-        # Push changes
-        log_message("Pushing changes to GitHub...")
-        git_command("git push")
+    commit_msg = random.choice(COMMIT_MESSAGES)
+
+    try:
+        if GIT_BACKEND == PLUMBING:
+            # Commit the file straight onto HEAD without scanning the working tree
+            with open(file_path) as f:
+                data = f.read()
+            log_message(f"Committing {rel_path} via git plumbing with message: {commit_msg}")
+            with registry.span("commit", repo):
+                committed = commit_files(REPO_PATH, {rel_path: data}, commit_msg)
+            if not committed:
+                log_message("No changes to commit. Skipping.")
+                return "skipped"
+        else:
+            # Stage only the file we just wrote instead of scanning the whole working tree
+            log_message(f"Adding {rel_path} to commit...")
+            with registry.span("add", repo):
+                git_command(f'git add -- "{rel_path}"')
+
+            # Check if there are changes to commit
+            with registry.span("status", repo):
+                changed = staged_changes(REPO_PATH, [rel_path])
+            if not changed:
+                log_message("No changes to commit. Skipping.")
+                return "skipped"
+
+            # Commit changes
+            log_message(f"Committing with message: {commit_msg}")
+            with registry.span("commit", repo):
+                git_command(f'git commit -m "{commit_msg}"')
+
+        # Hold the commit locally until the batch is due
+        pending = _batcher.record(REPO_PATH)
+        if not _batcher.is_due(REPO_PATH, BATCH_SIZE, BATCH_WINDOW_SECONDS):
+            log_message(f"Committed locally ({pending}/{BATCH_SIZE} pending). Deferring push...")
+            return "deferred"
+
+        sync_with_remote()
 
         log_message(f"✅ Committed and pushed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        return "committed"
     
     except subprocess.CalledProcessError as e:
         log_message(f"Commit failed: {e}")
-        # Stash changes, pull, and retry
-        log_message("Stashing changes to recover...")
-        git_command("git stash")
-        git_command("git pull --rebase")
-        git_command("git stash pop")
-        # Retry commit and push
-        log_message("Retrying commit and push after stash...")
-        git_command("git add .")
-        git_command(f'git commit -m "{commit_msg} (retry)"')
-        git_command("git push")
+        registry.inc("bot_retries_total", repo=repo, reason="recovery")
+        with registry.span("recovery", repo):
+            # Fetch once and replay our appends as one commit on the remote tip (no stash, no merge)
+            log_message("Rebuilding commit on top of the remote tip to recover...")
+            target = rebuild_on_upstream(REPO_PATH, [rel_path], f"{commit_msg} (retry)", append_only_patterns())
+            if target == resolve(REPO_PATH, "@{upstream}"):
+                raise RuntimeError("Recovery left nothing to push; no commit was made") from e
+            git_command("git push")
+        _batcher.clear(REPO_PATH)
+        record_sync()
         log_message(f"✅ Recovered and pushed at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        return "recovered"
+
+def run_once():
+    """Make one commit, record its latency and outcome, and export the metrics files."""
+    repo = os.path.basename(REPO_PATH)
+    started = time.monotonic()
+    status = "failed"
+    try:
+        # Bound the whole cycle, not just each command, so a slow remote cannot stall the schedule
+        with git_exec.limits(started + CYCLE_TIMEOUT_SECONDS, COMMAND_TIMEOUT_SECONDS):
+            status = make_commit()
+        return status
+    except subprocess.TimeoutExpired:
+        status = "timed_out"
+        raise
+    finally:
+        registry.observe("bot_commit_latency_seconds", time.monotonic() - started, repo=repo)
+        registry.inc("bot_commits_total", repo=repo, status=status)
+        try:
+            registry.export(METRICS_PROM_FILE, METRICS_JSON_FILE)
+        except OSError as e:
+            log_message(f"Could not write metrics: {e}")
+
+def idle_maintenance(until):
+    """Repack, refresh the commit-graph / multi-pack-index and do periodic housekeeping while nothing is due before until."""
+    if not MAINTENANCE_ENABLED:
+        return
+    index = repo_state.get_index(REPO_STATE_FILE)
+    last_run = index.get(REPO_PATH).get("periodic_maintenance", {})
+    try:
+        report = maintenance.maybe_maintain(REPO_PATH, until, repo=os.path.basename(REPO_PATH), last_run=last_run)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        log_message(f"Maintenance stopped: {e}", phase="maintenance")
+        return
+    if report:
+        log_message(maintenance.summarize(report), phase="maintenance", duration=report["duration"])
+        index.update(REPO_PATH, last_maintenance=time.time(), periodic_maintenance={**last_run, **report["periodic"]})
 
 def main():
-    """Run commits every 2 minutes indefinitely."""
-    log_message("Starting 2-minute interval commit bot...")
+    """Run commits on the persisted schedule indefinitely."""
+    log_message(f"Starting commit bot (interval: {COMMIT_INTERVAL_SECONDS} seconds)...")
+    # Concurrent appends from other machines merge with git's union driver instead of conflicting
+    register_merge_drivers(REPO_PATH, append_only_patterns())
+    if MAINTENANCE_ENABLED:
+        # Maintenance runs between commits instead of as auto-gc in the middle of one
+        maintenance.disable_auto_gc(REPO_PATH)
+    else:
+        maintenance.restore_auto_gc(REPO_PATH)
+    seed_pending()
+    scheduler = DeadlineScheduler(SCHEDULE_STATE_FILE, CATCH_UP_POLICY)
+    scheduler.add(REPO_PATH, COMMIT_INTERVAL_SECONDS)
     while True:
         try:
-            make_commit()
-            log_message("⏳ Sleeping for 2 minutes...")
-            time.sleep(21600)  # Sleep for 2 minutes (120 seconds)
+            next_run = datetime.fromtimestamp(scheduler.next_due()[0]).strftime('%Y-%m-%d %H:%M:%S')
+            log_message(f"⏳ Sleeping until {next_run}...")
+            due_keys = scheduler.wait(idle=idle_maintenance, wake_by=next_flush())
+            # Push a batch whose window ran out, even if no commit is due yet
+            flush_pending(due_only=True)
+            for key in due_keys:
+                try:
+                    run_once()
+                    _retry.success(key)
+                    scheduler.complete(key)
+                except Exception as e:
+                    delay = _retry.failure(key, ERROR_RETRY_SECONDS, BACKOFF_MAX_SECONDS,
+                                           BREAKER_THRESHOLD, BREAKER_PARK_SECONDS)
+                    if _retry.parked(key):
+                        log_message(f"Unexpected error: {e}. {_retry.failures(key)} failures in a row, "
+                                    f"parking for {delay:.0f} seconds...")
+                    else:
+                        log_message(f"Unexpected error: {e}. Retrying in {delay:.0f} seconds...")
+                    scheduler.complete(key, retry_after=delay)
+            _retry.success("main loop")
         except KeyboardInterrupt:
             log_message("Script stopped by user.")
+            flush_pending()
             break
         except Exception as e:
-            log_message(f"Unexpected error: {e}. Continuing...")
-            time.sleep(21600)  # Brief pause before retrying to avoid rapid error loops
+            # Back off exponentially (from about 60 s up to BACKOFF_MAX_SECONDS) to avoid rapid error loops
+            delay = _retry.failure("main loop", 60, BACKOFF_MAX_SECONDS)
+            log_message(f"Unexpected error in main loop: {e}. Continuing in {delay:.0f} seconds...")
+            time.sleep(delay)
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,40 @@
 import os
 import random
+import shutil
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+import bot_logger
+import git_exec
+import maintenance
+import repo_state
+from backoff import RetryPolicy
+from clone_strategies import clone_repo, disk_usage, ensure_shared_store, reshallow
+from git_backend import (
+    PLUMBING, PORCELAIN, commit_files, count_unpushed, oldest_unpushed_time, rebuild_on_upstream,
+    register_merge_drivers, remote_tip, resolve, staged_changes,
+)
+from metrics import registry
+from push_batcher import PushBatcher
+from scheduler import CATCH_UP_ONCE, DeadlineScheduler
+from storage_layout import FLAT, SHARDED, current_segment, split_name
+
 # Configuration
 BASE_PATH = "/Users/app/Documents"  # Base directory for repositories
 LOG_FILE = os.path.join(BASE_PATH, "multi_repo_bot_log.txt")  # Log file outside the repos
+LOG_FORMAT = bot_logger.TEXT  # TEXT, or JSON for one object per line with repo/phase/duration fields
+GIT_BACKEND = PORCELAIN  # PORCELAIN (status/add/commit) or PLUMBING (commit straight onto HEAD)
+STORAGE_LAYOUT = FLAT  # FLAT (new top-level dummy file per run) or SHARDED (size-capped <stem>/YYYY/MM/DD-NNN.txt)
+BATCH_SIZE = 1  # Local commits to accumulate before one fetch+rebase+push (1 = push every commit)
+BATCH_WINDOW_SECONDS = None  # Also push once the oldest unpushed commit is this old, even between runs (None = size only)
 
 # List of repositories to manage
+# Optional per-repo keys: "interval_minutes" overrides CYCLE_INTERVAL_SECONDS,
+# "batch_size" and "batch_window" override BATCH_SIZE / BATCH_WINDOW_SECONDS,
+# "clone" overrides CLONE_STRATEGY (e.g. {"depth": 1, "filter": "blob:none", "sparse": True})
 REPOSITORIES = [
     {
         "url": "https://github.com/meharsarmad786/autogit.git",
@@ -42,6 +68,29 @@ REPOSITORIES = [
     }
 ]
 
+# Clone strategy for every repository without its own "clone" dict
+# (keys: depth, filter, sparse, shared, reshallow_every -- see clone_strategies.py; {} = full clone)
+CLONE_STRATEGY = {}
+SHARED_OBJECTS_PATH = os.path.join(BASE_PATH, ".shared-objects.git")  # Alternates store for "shared" clones
+
+# Concurrency and scheduling
+MAX_WORKERS = 8  # Global cap on repositories processed at the same time
+# Time between commits to each repository: 4 days, the cadence of the original serial loop
+# (a 21600 s sleep after each of the 6 repositories plus 5 * 43200 s at the end of every round)
+CYCLE_INTERVAL_SECONDS = 6 * 21600 + 5 * 43200
+ERROR_RETRY_SECONDS = 300  # First retry of a failed repository; doubles (with jitter) on each further failure
+BACKOFF_MAX_SECONDS = 3600  # Cap on that retry delay
+BREAKER_THRESHOLD = 5  # Consecutive failures before a repository is parked (healthy ones are unaffected)
+BREAKER_PARK_SECONDS = 21600  # How long a parked repository waits before one probe attempt
+COMMAND_TIMEOUT_SECONDS = 120  # Kill (with its process group) any git command running longer than this
+CYCLE_TIMEOUT_SECONDS = 900  # Budget for a whole cycle; repos still queued when it runs out are postponed
+SCHEDULE_STATE_FILE = os.path.join(BASE_PATH, "multi_repo_bot_schedule.json")  # Per-repo next-due times
+CATCH_UP_POLICY = CATCH_UP_ONCE  # What to do with cycles missed while the bot was down
+REPO_STATE_FILE = os.path.join(BASE_PATH, "multi_repo_bot_state.json")  # Last known HEAD / remote ref / push time per repo
+METRICS_PROM_FILE = os.path.join(BASE_PATH, "multi_repo_bot_metrics.prom")  # Prometheus text file (None to disable)
+METRICS_JSON_FILE = os.path.join(BASE_PATH, "multi_repo_bot_metrics.json")  # JSON summary per cycle (None to disable)
+MAINTENANCE_ENABLED = True  # Replace auto-gc with idle-time repacks, commit-graph / multi-pack-index and periodic gc (see maintenance.py)
+
 COMMIT_MESSAGES = [
     "Add dummy content",
     "Update repository files",
@@ -52,152 +101,510 @@ COMMIT_MESSAGES = [
     "Maintain repository activity"
 ]
 
-def log_message(message):
-    """Append a message to the log file with a timestamp."""
-    with open(LOG_FILE, 'a') as f:
-        f.write(f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
-    print(message)
+_batcher = PushBatcher()
+_retry = RetryPolicy()
+_repo_locks = {}
+_repo_locks_guard = threading.Lock()
+
+def log_message(message, repo=None, phase=None, duration=None):
+    """Queue a timestamped message for the background log writer and echo it."""
+    bot_logger.get_writer(LOG_FILE, LOG_FORMAT).log(message, repo=repo, phase=phase, duration=duration)
+    print(f"[{repo}] {message}" if repo else message)
+
+def get_repo_lock(repo):
+    """Return the lock guarding a repository's working tree."""
+    with _repo_locks_guard:
+        return _repo_locks.setdefault(repo["name"], threading.Lock())
 
 def git_command(cmd, repo_path):
     """Run a git command in the specified repo directory and handle errors."""
+    repo = os.path.basename(repo_path)
+    phase = cmd.split()[1] if cmd.startswith("git ") else cmd
+    started = time.monotonic()
     try:
-        result = subprocess.run(
-            cmd, cwd=repo_path, shell=True, capture_output=True, text=True, check=True
-        )
-        log_message(f"[{os.path.basename(repo_path)}] Command '{cmd}' output: {result.stdout.strip()}")
+        result = git_exec.run(cmd, repo_path, shell=True)
+        duration = time.monotonic() - started
+        registry.record_subprocess(phase, repo, duration, result.returncode)
+        log_message(f"Command '{cmd}' output: {bot_logger.summarize_output(result.stdout.strip())}",
+                    repo=repo, phase=phase, duration=duration)
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
-        log_message(f"[{os.path.basename(repo_path)}] Error running command: {cmd}\nSTDERR: {e.stderr}")
+        duration = time.monotonic() - started
+        registry.record_subprocess(phase, repo, duration, e.returncode)
+        log_message(f"Error running command: {cmd} (exit {e.returncode})\nSTDERR: {e.stderr.strip()}",
+                    repo=repo, phase=phase, duration=duration)
+        raise
+    except subprocess.TimeoutExpired:
+        duration = time.monotonic() - started
+        registry.record_subprocess(phase, repo, duration, None)
+        log_message(f"Timed out after {duration:.0f}s, killed: {cmd}", repo=repo, phase=phase, duration=duration)
         raise
 
+def bot_paths(repo):
+    """Return sparse-checkout patterns covering every file the bot writes in a repository."""
+    prefix, suffix = repo["dummy_file"].split("{}", 1)
+    stem, _ = split_name(repo["dummy_file"])
+    return ["/timestamp.txt", f"/{prefix}*{suffix}", f"/{stem}/"]
+
+def append_only_patterns(repo):
+    """Return gitattributes patterns for the files the bot only ever appends to (or creates once)."""
+    prefix, suffix = repo["dummy_file"].split("{}", 1)
+    stem, _ = split_name(repo["dummy_file"])
+    return [f"/{prefix}*{suffix}", f"/{stem}/**"]
+
+def configure_checkout(repo, repo_path):
+    """One-time setup per repository: merge drivers for the bot's files and auto-gc off while maintenance is on."""
+    state = state_index().get(repo["name"])
+    if not state.get("merge_drivers"):
+        register_merge_drivers(repo_path, append_only_patterns(repo), ["/timestamp.txt"])
+        state_index().update(repo["name"], merge_drivers=True)
+    if MAINTENANCE_ENABLED and not state.get("auto_gc_disabled"):
+        # Maintenance runs between cycles instead of as auto-gc in the middle of one
+        maintenance.disable_auto_gc(repo_path)
+        state_index().update(repo["name"], auto_gc_disabled=True)
+    elif not MAINTENANCE_ENABLED and state.get("auto_gc_disabled"):
+        maintenance.restore_auto_gc(repo_path)
+        state_index().update(repo["name"], auto_gc_disabled=False)
+
 def clone_repo_if_needed(repo):
-    """Clone repository if it doesn't exist locally."""
+    """Clone repository if it doesn't exist locally, using its clone strategy."""
     repo_path = os.path.join(BASE_PATH, repo["name"])
     
     if not os.path.exists(repo_path):
-        log_message(f"Cloning repository {repo['url']} to {repo_path}...")
+        strategy = repo.get("clone", CLONE_STRATEGY)
+        log_message(f"Cloning repository {repo['url']} to {repo_path} (strategy: {strategy or 'full'})...")
         os.makedirs(BASE_PATH, exist_ok=True)
         
         try:
-            subprocess.run(
-                f"git clone {repo['url']} {repo_path}",
-                shell=True, check=True, capture_output=True, text=True
-            )
-            log_message(f"Repository {repo['name']} cloned successfully.")
-        except subprocess.CalledProcessError as e:
-            log_message(f"Failed to clone repository {repo['name']}: {e.stderr}")
+            # Timed here, so only an actual clone (shared store fetch included) records a clone phase
+            with registry.span("clone", repo["name"]):
+                shared_store = None
+                if strategy.get("shared"):
+                    shared_store = ensure_shared_store(SHARED_OBJECTS_PATH, repo["name"], repo["url"])
+                clone_repo(repo["url"], repo_path, strategy, bot_paths(repo), shared_store, repo=repo["name"])
+            log_message(f"Repository {repo['name']} cloned successfully ({disk_usage(repo_path) // 1024} KiB on disk).")
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            # A TimeoutExpired raised before git even started carries no stderr
+            log_message(f"Failed to clone repository {repo['name']}: {(e.stderr or '').strip() or e}")
+            shutil.rmtree(repo_path, ignore_errors=True)  # Don't leave a half-provisioned checkout behind
             return None
-    else:
+        state_index().forget(repo["name"])
+        state_index().update(repo["name"], cloned=True)
+    elif not state_index().get(repo["name"]).get("cloned"):
         log_message(f"Repository {repo['name']} already exists locally.")
+        state_index().update(repo["name"], cloned=True)
     
     return repo_path
 
-def create_dummy_content(repo):
-    """Create or update a dummy file with unique content."""
+def maybe_reshallow(repo, repo_path, pushed):
+    """Re-shallow a depth-limited clone once enough commits have been pushed on top of it."""
+    strategy = repo.get("clone", CLONE_STRATEGY)
+    if not (strategy.get("depth") and strategy.get("reshallow_every")):
+        return
+    count = state_index().get(repo["name"]).get("commits_since_reshallow", 0) + pushed
+    if count < strategy["reshallow_every"]:
+        state_index().update(repo["name"], commits_since_reshallow=count)
+        return
+    
+    before = disk_usage(repo_path)
+    try:
+        reshallow(repo_path, strategy["depth"])
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        log_message(f"Re-shallow failed: {(e.stderr or '').strip() or e}", repo=repo["name"])
+        return
+    log_message(
+        f"Re-shallowed to depth {strategy['depth']}: {before // 1024} KiB -> {disk_usage(repo_path) // 1024} KiB.",
+        repo=repo["name"], phase="reshallow"
+    )
+    state_index().update(repo["name"], commits_since_reshallow=0)
+
+def build_dummy_content(repo):
+    """Return {relative_path: content} for the files written on this run."""
     repo_path = os.path.join(BASE_PATH, repo["name"])
     timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    file_name = repo["dummy_file"].format(timestamp)
-    file_path = os.path.join(repo_path, file_name)
     
     # Generate unique content
     content = f"This is an automated test file generated at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}.\n"
     content += f"Random data: {random.randint(10000, 99999)}\n"
     
-    # Write content to file
-    with open(file_path, 'w') as f:
-        f.write(content)
+    if STORAGE_LAYOUT == SHARDED:
+        # Append to the current dated segment instead of adding another top-level file
+        stem, ext = split_name(repo["dummy_file"])
+        file_name = current_segment(repo_path, stem, len(content.encode("utf-8")), ext=ext)
+        segment = os.path.join(repo_path, file_name)
+        if os.path.exists(segment):
+            with open(segment, encoding="utf-8") as f:
+                content = f.read() + content
+    else:
+        file_name = repo["dummy_file"].format(timestamp)
     
     # Also update a timestamp.txt file to ensure at least one file is always modified
-    with open(os.path.join(repo_path, "timestamp.txt"), 'w') as f:
-        f.write(f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    return {
+        file_name: content,
+        "timestamp.txt": f"Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+    }
+
+def create_dummy_content(repo):
+    """Create or update a dummy file with unique content and return {relative_path: content}."""
+    repo_path = os.path.join(BASE_PATH, repo["name"])
+    files = build_dummy_content(repo)
     
-    log_message(f"[{repo['name']}] Created dummy file: {file_name}")
-    return file_path
+    # Write content to files
+    for file_name, content in files.items():
+        file_path = os.path.join(repo_path, file_name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w', encoding="utf-8") as f:
+            f.write(content)
+    
+    file_name = next(iter(files))
+    log_message(f"Created dummy file: {file_name}", repo=repo["name"])
+    return files
+
+def state_index():
+    """Return the persisted per-repository state index."""
+    return repo_state.get_index(REPO_STATE_FILE)
+
+def record_sync(repo, repo_path, pushed=True):
+    """Remember where HEAD and the upstream ref stand right after a pull or push."""
+    fields = {"local_head": resolve(repo_path, "HEAD"), "remote_ref": resolve(repo_path, "@{upstream}")}
+    if pushed:
+        fields["last_push"] = time.time()
+    state_index().update(repo["name"], **fields)
+
+def is_checkout_in_sync(repo, repo_path):
+    """True if HEAD is where the last sync left it and the remote branch has not moved since.
+
+    The remote side is checked with a single ls-remote, which is much cheaper
+    than the fetch a pull would do.
+    """
+    state = state_index().get(repo["name"])
+    if state.get("local_head") is None or state.get("local_head") != resolve(repo_path, "HEAD"):
+        return False
+    tip = remote_tip(repo_path)
+    return tip is not None and tip == state.get("remote_ref")
+
+def sync_repo(repo, repo_path):
+    """Push a repository's pending commits, rebasing them only if the remote has moved."""
+    # Push changes; a rejection means the remote moved, so rebase onto it and push once more
+    pushed = _batcher.pending(repo["name"])
+    log_message(f"Pushing {pushed} local commit(s) to GitHub...", repo=repo["name"])
+    try:
+        with registry.span("push", repo["name"]):
+            git_command("git push", repo_path)
+    except subprocess.CalledProcessError:
+        log_message("Push rejected. Pulling with rebase to sync with remote...", repo=repo["name"])
+        registry.inc("bot_retries_total", repo=repo["name"], reason="push_rejected")
+        with registry.span("pull", repo["name"]):
+            git_command("git pull --rebase", repo_path)
+        with registry.span("push", repo["name"]):
+            git_command("git push", repo_path)
+    _batcher.clear(repo["name"])
+    record_sync(repo, repo_path)
+    maybe_reshallow(repo, repo_path, pushed)
+
+def seed_pending():
+    """Pick up commits a previous run left unpushed (@{upstream}..HEAD) so they join the next batch."""
+    for repo in REPOSITORIES:
+        repo_path = os.path.join(BASE_PATH, repo["name"])
+        if os.path.exists(repo_path):
+            _batcher.seed(repo["name"], count_unpushed(repo_path), oldest_unpushed_time(repo_path))
+
+def batch_due(repo):
+    """True if a repository's pending commits should be pushed now (batch full or window elapsed)."""
+    return _batcher.is_due(repo["name"], repo.get("batch_size", BATCH_SIZE), repo.get("batch_window", BATCH_WINDOW_SECONDS))
+
+def next_flush():
+    """Return the earliest time a pending batch runs out of window (None if none is ahead of now)."""
+    now = time.time()
+    deadlines = [_batcher.flush_deadline(repo["name"], repo.get("batch_window", BATCH_WINDOW_SECONDS))
+                 for repo in REPOSITORIES]
+    ahead = [at for at in deadlines if at is not None and at > now]
+    return min(ahead) if ahead else None
+
+def flush_pending(due_only=False):
+    """Push commits held back by batching: every repository's on shutdown, or with due_only those whose batch is due."""
+    for repo in REPOSITORIES:
+        if not _batcher.pending(repo["name"]) or (due_only and not batch_due(repo)):
+            continue
+        lock = get_repo_lock(repo)
+        if not lock.acquire(blocking=False):
+            continue
+        try:
+            with git_exec.limits(time.monotonic() + CYCLE_TIMEOUT_SECONDS, COMMAND_TIMEOUT_SECONDS):
+                sync_repo(repo, os.path.join(BASE_PATH, repo["name"]))
+            log_message("✅ Pushed batched commits (batch window elapsed)." if due_only
+                        else "✅ Flushed pending commits before exit.", repo=repo["name"])
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            log_message(f"Could not flush pending commits: {e}. They stay committed locally.", repo=repo["name"])
+        finally:
+            lock.release()
 
 def make_commit_for_repo(repo):
-    """Generate dummy content, commit, and push to GitHub for a specific repository."""
+    """Generate dummy content, commit, and push to GitHub for a specific repository.
+
+    Returns one of "committed", "deferred", "recovered", "skipped", "timed_out" or "failed".
+    """
     repo_path = clone_repo_if_needed(repo)
     if not repo_path:
         log_message(f"Skipping repository {repo['name']} due to cloning failure.")
-        return
+        return "failed"
     
+    files = {}
+    commit_msg = random.choice(COMMIT_MESSAGES)
     try:
-        # Pull latest changes first
-        log_message(f"[{repo['name']}] Pulling latest changes...")
-        git_command("git pull", repo_path)
+        configure_checkout(repo, repo_path)
         
-        # Create dummy content
-        create_dummy_content(repo)
+        # Pull latest changes first, unless deferred commits are waiting for the batch rebase or
+        # neither the checkout nor the remote branch has moved since our last sync
+        if not _batcher.pending(repo["name"]):
+            if is_checkout_in_sync(repo, repo_path):
+                log_message("Remote unchanged since last sync. Skipping pull.", repo=repo["name"])
+            else:
+                log_message("Pulling latest changes...", repo=repo["name"])
+                with registry.span("pull", repo["name"]):
+                    git_command("git pull", repo_path)
+                record_sync(repo, repo_path, pushed=False)
         
-        # Check git status
-        log_message(f"[{repo['name']}] Checking git status...")
-        git_command("git status", repo_path)
-        
-        # Stage all modified files
-        log_message(f"[{repo['name']}] Adding all modified files to commit...")
-        git_command("git add .", repo_path)
-        
-        # Check if there are changes to commit
-        status = git_command("git status", repo_path)
-        if "nothing to commit" in status:
-            log_message(f"[{repo['name']}] No changes to commit. Skipping.")
-            return
+        if GIT_BACKEND == PLUMBING:
+            # Commit the generated files straight onto HEAD without scanning the working tree
+            with registry.span("content", repo["name"]):
+                files = build_dummy_content(repo)
+            log_message(f"Committing {len(files)} files via git plumbing with message: {commit_msg}", repo=repo["name"])
+            with registry.span("commit", repo["name"]):
+                committed = commit_files(repo_path, files, commit_msg)
+            if not committed:
+                log_message("No changes to commit. Skipping.", repo=repo["name"])
+                return "skipped"
+        else:
+            # Create dummy content
+            with registry.span("content", repo["name"]):
+                files = create_dummy_content(repo)
+            
+            # Stage only the files we just wrote instead of scanning the whole working tree
+            log_message(f"Adding {len(files)} written files to commit...", repo=repo["name"])
+            with registry.span("add", repo["name"]):
+                git_command("git add -- " + " ".join(f'"{path}"' for path in files), repo_path)
+            
+            # Check if there are changes to commit
+            with registry.span("status", repo["name"]):
+                changed = staged_changes(repo_path, list(files))
+            if not changed:
+                log_message("No changes to commit. Skipping.", repo=repo["name"])
+                return "skipped"
+            
+            # Commit changes
+            log_message(f"Committing with message: {commit_msg}", repo=repo["name"])
+            with registry.span("commit", repo["name"]):
+                git_command(f'git commit -m "{commit_msg}"', repo_path)
         
-        # Commit changes
-        commit_msg = random.choice(COMMIT_MESSAGES)
-        log_message(f"[{repo['name']}] Committing with message: {commit_msg}")
-        git_command(f'git commit -m "{commit_msg}"', repo_path)
+        # Hold the commit locally until the batch is due
+        pending = _batcher.record(repo["name"])
+        if not batch_due(repo):
+            batch_size = repo.get("batch_size", BATCH_SIZE)
+            log_message(f"Committed locally ({pending}/{batch_size} pending). Deferring push...", repo=repo["name"])
+            return "deferred"
         
-        # Push changes
-        log_message(f"[{repo['name']}] Pushing changes to GitHub...")
-        git_command("git push", repo_path)
+        sync_repo(repo, repo_path)
         
-        log_message(f"[{repo['name']}] ✅ Committed and pushed successfully.")
+        log_message("✅ Committed and pushed successfully.", repo=repo["name"])
+        return "committed"
     
     except subprocess.CalledProcessError as e:
-        log_message(f"[{repo['name']}] Failed during git operations: {e}")
+        log_message(f"Failed during git operations: {e}", repo=repo["name"])
+        registry.inc("bot_retries_total", repo=repo["name"], reason="recovery")
         # Try to recover
         try:
-            log_message(f"[{repo['name']}] Attempting to recover with stash-pull-pop strategy...")
-            git_command("git stash", repo_path)
-            git_command("git pull --rebase", repo_path)
-            git_command("git stash pop", repo_path)
-            # Retry commit and push
-            git_command("git add .", repo_path)
-            commit_msg = random.choice(COMMIT_MESSAGES) + " (retry)"
-            git_command(f'git commit -m "{commit_msg}"', repo_path)
-            git_command("git push", repo_path)
-            log_message(f"[{repo['name']}] ✅ Recovered and pushed successfully.")
+            with registry.span("recovery", repo["name"]):
+                # Fetch once and replay our files as one commit on the remote tip (no stash, no merge)
+                log_message("Rebuilding commit on top of the remote tip to recover...", repo=repo["name"])
+                target = rebuild_on_upstream(repo_path, list(files), f"{commit_msg} (retry)", append_only_patterns(repo))
+                if target == resolve(repo_path, "@{upstream}"):
+                    # The failure came before anything of ours was committed: the checkout is
+                    # back on the remote tip, but there is no commit to push
+                    log_message("Nothing to replay after the failure. Checkout reset to the remote tip.",
+                                repo=repo["name"])
+                    _batcher.clear(repo["name"])
+                    return "failed"
+                git_command("git push", repo_path)
+            _batcher.clear(repo["name"])
+            record_sync(repo, repo_path)
+            log_message("✅ Recovered and pushed successfully.", repo=repo["name"])
+            return "recovered"
         except Exception as recovery_error:
-            log_message(f"[{repo['name']}] Recovery failed: {recovery_error}")
+            log_message(f"Recovery failed: {recovery_error}", repo=repo["name"])
+            return "failed"
+    except subprocess.TimeoutExpired as e:
+        # A hung remote will not answer a recovery attempt either; back off instead
+        log_message(f"Timed out during git operations: {e}", repo=repo["name"])
+        return "timed_out"
     except Exception as e:
-        log_message(f"[{repo['name']}] Unexpected error: {e}")
+        log_message(f"Unexpected error: {e}", repo=repo["name"])
+        return "failed"
 
-def process_all_repositories(interval_minutes=21600):
-    """Process all repositories with a delay between each."""
-    log_message(f"Starting multi-repository commit bot (interval: {interval_minutes} minutes)...")
+def process_repo_isolated(repo, deadline=None):
+    """Run one repository's commit cycle within the cycle deadline, never letting its failure escape."""
+    if deadline is not None and time.monotonic() >= deadline:
+        log_message("Cycle deadline reached before this repository started. Postponing.", repo=repo["name"])
+        return "postponed"
+    lock = get_repo_lock(repo)
+    if not lock.acquire(blocking=False):
+        log_message("Still busy from a previous cycle. Skipping.", repo=repo["name"])
+        return "skipped"
+    started = time.monotonic()
+    status = "failed"
+    try:
+        if not os.path.exists(os.path.join(BASE_PATH, repo["name"])):
+            # First-time provisioning runs outside the cycle deadline, bounded only by
+            # SLOW_COMMAND_TIMEOUT_SECONDS: a big clone cut off by the deadline would be
+            # thrown away and restarted from scratch every cycle
+            if not clone_repo_if_needed(repo):
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                log_message("Cycle deadline passed while cloning. Postponing the first commit.", repo=repo["name"])
+                status = "postponed"
+                return status
+        with git_exec.limits(deadline, COMMAND_TIMEOUT_SECONDS):
+            status = make_commit_for_repo(repo)
+        return status
+    except Exception as e:
+        log_message(f"Worker crashed: {e}", repo=repo["name"])
+        return "failed"
+    finally:
+        registry.observe("bot_commit_latency_seconds", time.monotonic() - started, repo=repo["name"])
+        registry.inc("bot_commits_total", repo=repo["name"], status=status)
+        lock.release()
+
+def run_cycle(repositories, max_workers=MAX_WORKERS):
+    """Process repositories concurrently on a bounded pool and return a summary.
+
+    Every git command in the cycle shares one CYCLE_TIMEOUT_SECONDS deadline,
+    so the slowest remote cannot stretch the cycle past it. First-time clones
+    are the exception (see process_repo_isolated).
+    """
+    started = time.monotonic()
+    deadline = started + CYCLE_TIMEOUT_SECONDS if CYCLE_TIMEOUT_SECONDS else None
+    results = {}
+    workers = max(1, min(max_workers, len(repositories)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="repo") as pool:
+        futures = {pool.submit(process_repo_isolated, repo, deadline): repo for repo in repositories}
+        for future in as_completed(futures):
+            results[futures[future]["name"]] = future.result()
+
+    summary = {"duration": time.monotonic() - started, "results": results}
+    for status in ("committed", "deferred", "recovered", "skipped", "postponed", "timed_out", "failed"):
+        summary[status] = sum(1 for r in results.values() if r == status)
+    log_message(
+        f"Cycle finished in {summary['duration']:.1f}s: "
+        f"{summary['committed']} committed, {summary['deferred']} deferred, {summary['recovered']} recovered, "
+        f"{summary['skipped']} skipped, {summary['postponed']} postponed, {summary['timed_out']} timed out, "
+        f"{summary['failed']} failed "
+        f"({len(repositories)} repositories, {workers} workers).",
+        phase="cycle", duration=summary["duration"]
+    )
+    failed = sorted(name for name, r in results.items() if r in ("failed", "timed_out"))
+    if failed:
+        log_message(f"Failed repositories: {', '.join(failed)}")
+    
+    registry.observe("bot_cycle_duration_seconds", summary["duration"])
+    try:
+        registry.export(METRICS_PROM_FILE, METRICS_JSON_FILE, extra={"cycle": summary})
+    except OSError as e:
+        log_message(f"Could not write metrics: {e}")
+    return summary
+
+def retry_delay(name, status):
+    """Return when to run a repository again after a cycle (None = its normal interval).
+
+    Failures back off exponentially and park the repository once
+    BREAKER_THRESHOLD of them happen in a row; postponed repositories go
+    straight back into the next cycle.
+    """
+    if status in ("failed", "timed_out"):
+        delay = _retry.failure(name, ERROR_RETRY_SECONDS, BACKOFF_MAX_SECONDS, BREAKER_THRESHOLD, BREAKER_PARK_SECONDS)
+        if _retry.parked(name):
+            log_message(f"{_retry.failures(name)} failures in a row. Parking for {delay:.0f} seconds.", repo=name)
+        else:
+            log_message(f"Retrying in {delay:.0f} seconds.", repo=name)
+        return delay
+    if status == "postponed":
+        return 0
+    if status != "skipped":
+        _retry.success(name)
+    return None
+
+def idle_maintenance(until):
+    """Maintain repositories that crossed a growth threshold or are due housekeeping while nothing is due before until."""
+    if not MAINTENANCE_ENABLED:
+        return
+    for repo in REPOSITORIES:
+        repo_path = os.path.join(BASE_PATH, repo["name"])
+        if until - time.time() < maintenance.MIN_IDLE_SECONDS:
+            break
+        if not os.path.isdir(repo_path):
+            continue
+        lock = get_repo_lock(repo)
+        if not lock.acquire(blocking=False):
+            continue
+        last_run = state_index().get(repo["name"]).get("periodic_maintenance", {})
+        try:
+            report = maintenance.maybe_maintain(repo_path, until, repo=repo["name"], last_run=last_run)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            log_message(f"Maintenance stopped: {e}", repo=repo["name"], phase="maintenance")
+            continue
+        finally:
+            lock.release()
+        if report:
+            log_message(maintenance.summarize(report), repo=repo["name"], phase="maintenance",
+                        duration=report["duration"])
+            state_index().update(repo["name"], last_maintenance=time.time(),
+                                 periodic_maintenance={**last_run, **report["periodic"]})
+
+def process_all_repositories(interval_seconds=CYCLE_INTERVAL_SECONDS, max_workers=MAX_WORKERS):
+    """Process each repository whenever its persisted deadline comes due, running due repos concurrently."""
+    log_message(
+        f"Starting multi-repository commit bot (interval: {interval_seconds} seconds, "
+        f"workers: {max_workers})..."
+    )
+    
+    seed_pending()
+    
+    scheduler = DeadlineScheduler(SCHEDULE_STATE_FILE, CATCH_UP_POLICY)
+    repos_by_name = {repo["name"]: repo for repo in REPOSITORIES}
+    for repo in REPOSITORIES:
+        interval = repo["interval_minutes"] * 60 if "interval_minutes" in repo else interval_seconds
+        scheduler.add(repo["name"], interval)
     
     while True:
         try:
-            for repo in REPOSITORIES:
-                log_message(f"Processing repository: {repo['name']}")
-                make_commit_for_repo(repo)
-                
-                # Short delay between repositories to avoid overwhelming
-                log_message("Waiting 30 seconds before processing next repository...")
-                time.sleep(21600)
+            # Wake only for the earliest deadline across all repositories
+            due, name = scheduler.next_due()
+            next_run = datetime.fromtimestamp(due).strftime('%Y-%m-%d %H:%M:%S')
+            log_message(f"⏳ Next run at {next_run} ({name})...")
+            due_repos = [repos_by_name[key] for key in scheduler.wait(idle=idle_maintenance, wake_by=next_flush())]
+            # Push batches whose window ran out, even for repositories with no commit due yet
+            flush_pending(due_only=True)
+            if not due_repos:
+                continue
             
-            # Wait for the specified interval before the next round
-            next_run = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            log_message(f"⏳ All repositories processed. Next run at {next_run} (in {interval_minutes} minutes)...")
-            time.sleep(interval_minutes * 43200)
+            results = {}
+            try:
+                results = run_cycle(due_repos, max_workers)["results"]
+            finally:
+                # Always reschedule, so a crashed cycle cannot drop a repository from the heap
+                for repo in due_repos:
+                    status = results.get(repo["name"], "failed")
+                    scheduler.complete(repo["name"], retry_after=retry_delay(repo["name"], status))
+            _retry.success("main loop")
             
         except KeyboardInterrupt:
             log_message("Script stopped by user.")
+            flush_pending()
             break
         except Exception as e:
-            log_message(f"Unexpected error in main loop: {e}. Continuing after short delay...")
-            time.sleep(60)  # Brief pause before retrying to avoid rapid error loops
+            # Back off exponentially (from about 60 s up to BACKOFF_MAX_SECONDS) to avoid rapid error loops
+            delay = _retry.failure("main loop", 60, BACKOFF_MAX_SECONDS)
+            log_message(f"Unexpected error in main loop: {e}. Continuing in {delay:.0f} seconds...")
+            time.sleep(delay)
 
 if __name__ == "__main__":
-    process_all_repositories(interval_minutes=5)  # Default to 30 minutes between cycles 
\ No newline at end of file
+    process_all_repositories() 
\ No newline at end of file
@@ -0,0 +1,172 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+# Output formats
+TEXT = "text"  # "YYYY-mm-dd HH:MM:SS - [repo] message", like the original log files
+JSON = "json"  # One JSON object per line with time, repo, phase, duration and message
+
+# Rotation and buffering defaults
+MAX_BYTES = 5 * 1024 * 1024  # Rotate once the active file reaches this size
+MAX_AGE_SECONDS = 24 * 3600  # ...or once it has been open this long
+BACKUP_COUNT = 10            # Compressed segments to keep
+FLUSH_INTERVAL = 1.0         # Seconds between flushes when messages trickle in
+BATCH_SIZE = 500             # Max messages written per flush
+
+class BufferedLogWriter:
+    """Write log records from a background thread in batches, rotating and compressing old segments."""
+
+    def __init__(self, path, fmt=TEXT, max_bytes=MAX_BYTES, max_age_seconds=MAX_AGE_SECONDS,
+                 backup_count=BACKUP_COUNT, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE):
+        self.path = path
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._file = None
+        self._opened_at = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"log-writer:{os.path.basename(path)}", daemon=True)
+        self._thread.start()
+
+    def log(self, message, repo=None, phase=None, duration=None):
+        """Queue one record; never blocks on disk I/O."""
+        self._queue.put((time.time(), message, repo, phase, duration))
+
+    def flush(self, timeout=None):
+        """Block until every record queued so far has been written."""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        """Flush outstanding records and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _format(self, record):
+        created, message, repo, phase, duration = record
+        if self.fmt == JSON:
+            entry = {"time": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"), "message": message}
+            if repo is not None:
+                entry["repo"] = repo
+            if phase is not None:
+                entry["phase"] = phase
+            if duration is not None:
+                entry["duration"] = round(duration, 4)
+            return json.dumps(entry, ensure_ascii=False) + "\n"
+        prefix = f"[{repo}] " if repo else ""
+        return f"{datetime.fromtimestamp(created).strftime('%Y-%m-%d %H:%M:%S')} - {prefix}{message}\n"
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines, waiters = [], []
+            for item in batch:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    lines.append(self._format(item))
+
+            if lines:
+                try:
+                    self._write("".join(lines))
+                except OSError as e:
+                    print(f"Log writer failed to write {self.path}: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write(self, text):
+        if self._file and self._should_rotate():
+            self._rotate()
+        if not self._file:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding="utf-8")
+            self._opened_at = time.time()
+        self._file.write(text)
+        self._file.flush()
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        return bool(self.max_age_seconds) and time.time() - self._opened_at >= self.max_age_seconds
+
+    def _rotate(self):
+        """Close the active file, gzip it next to the log and prune old segments."""
+        self._file.close()
+        self._file = None
+        segment = f"{self.path}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.replace(self.path, segment)
+        with open(segment, 'rb') as src, gzip.open(f"{segment}.gz", 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(segment)
+
+        segments = sorted(glob.glob(f"{glob.escape(self.path)}.*.gz"))
+        for old in segments[:max(0, len(segments) - self.backup_count)]:
+            os.remove(old)
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(path, fmt=TEXT, **options):
+    """Return the shared writer for a log file, starting it on first use."""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None or writer.fmt != fmt:
+            if writer:
+                writer.close()
+            writer = _writers[path] = BufferedLogWriter(path, fmt, **options)
+        return writer
+
+def flush_all():
+    """Flush every open writer."""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+@atexit.register
+def close_all():
+    """Flush and stop every writer (runs automatically at interpreter exit)."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+def summarize_output(output, max_chars=200):
+    """Collapse command output to its first line so logs don't fill with multi-line dumps."""
+    if not output:
+        return ""
+    lines = output.splitlines()
+    first = lines[0][:max_chars]
+    return first if len(lines) == 1 else f"{first} (+{len(lines) - 1} more lines)"
@@ -0,0 +1,71 @@
+import os
+import threading
+
+from git_backend import run_git
+
+# Keys understood in a clone strategy dict (all optional; an empty dict is a plain full clone):
+#   depth           -- shallow clone with this many commits of history
+#   filter          -- partial clone filter, e.g. "blob:none" (needs uploadpack.allowFilter on the server)
+#   sparse          -- check out only the paths the bot writes (see sparse_paths in clone_repo)
+#   shared          -- borrow objects from a shared bare store via alternates (SHARED_OBJECTS_PATH in bot2.py)
+#   reshallow_every -- with depth, re-shallow to depth after this many pushed commits
+
+SLOW_COMMAND_TIMEOUT_SECONDS = 1800  # Clones, store fetches and gc move whole histories (first-time clones run outside bot2's cycle deadline)
+
+_shared_store_lock = threading.Lock()
+
+def ensure_shared_store(store_path, name, url):
+    """Fetch a repository's branches into the shared bare object store and return the store path.
+
+    Each repository gets its own refs/remotes/<name>/ namespace, which keeps
+    the objects that clones borrow through alternates reachable. Never prune
+    the store more aggressively than that.
+    """
+    with _shared_store_lock:
+        if not os.path.exists(os.path.join(store_path, "HEAD")):
+            os.makedirs(store_path, exist_ok=True)
+            run_git(["init", "--bare", "--quiet"], store_path, repo=name)
+        run_git(["fetch", "--quiet", "--no-tags", url, f"+refs/heads/*:refs/remotes/{name}/*"], store_path,
+                timeout=SLOW_COMMAND_TIMEOUT_SECONDS, repo=name)
+    return store_path
+
+def clone_repo(url, repo_path, strategy=None, sparse_paths=None, shared_store=None, repo=None):
+    """Clone url into repo_path following a strategy dict (see the keys above).
+
+    repo labels the clone's metrics (default: the name of repo_path).
+    """
+    repo = repo or os.path.basename(os.path.abspath(repo_path))
+    strategy = strategy or {}
+    args = ["clone", "--quiet"]
+    if strategy.get("depth"):
+        args += ["--depth", str(strategy["depth"])]
+    if strategy.get("filter"):
+        args += [f"--filter={strategy['filter']}"]
+    if strategy.get("sparse") and sparse_paths:
+        args += ["--no-checkout"]
+    if strategy.get("shared") and shared_store:
+        args += ["--reference-if-able", shared_store]
+    run_git([*args, url, repo_path], os.path.dirname(repo_path) or ".", timeout=SLOW_COMMAND_TIMEOUT_SECONDS, repo=repo)
+
+    if strategy.get("sparse") and sparse_paths:
+        # Non-cone patterns so single files at the top level can be listed
+        run_git(["sparse-checkout", "set", "--no-cone", *sparse_paths], repo_path, repo=repo)
+        run_git(["checkout", "--quiet"], repo_path, timeout=SLOW_COMMAND_TIMEOUT_SECONDS, repo=repo)
+
+def reshallow(repo_path, depth):
+    """Cut local history back to depth commits and drop the objects that fall outside it."""
+    branch = run_git(["rev-parse", "--abbrev-ref", "HEAD"], repo_path)
+    run_git(["fetch", "--quiet", f"--depth={depth}", "origin", branch], repo_path, timeout=SLOW_COMMAND_TIMEOUT_SECONDS)
+    run_git(["reflog", "expire", "--expire=now", "--all"], repo_path)
+    run_git(["gc", "--quiet", "--prune=now"], repo_path, timeout=SLOW_COMMAND_TIMEOUT_SECONDS)
+
+def disk_usage(repo_path):
+    """Return the size in bytes of a repository's .git directory."""
+    total = 0
+    for root, _, files in os.walk(os.path.join(repo_path, ".git")):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
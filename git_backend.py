@@ -0,0 +1,304 @@
+import fnmatch
+import os
+import subprocess
+import time
+
+import git_exec
+from metrics import registry
+
+# Backends understood by bot.py and bot2.py
+PORCELAIN = "porcelain"  # git status / git add / git commit in the working tree
+PLUMBING = "plumbing"    # hash-object / mktree / commit-tree / update-ref against HEAD
+
+def run_git(args, repo_path, input=None, strip=True, timeout=None, repo=None):
+    """Run git with an argument list (no shell) and return its (stripped) stdout.
+
+    timeout and the thread's deadline are enforced by git_exec.run. repo is
+    the metrics label, by default the name of the repo_path directory; pass
+    it when git runs from somewhere else (a clone runs in the parent).
+    """
+    started = time.monotonic()
+    returncode = -1
+    try:
+        result = git_exec.run(["git", *args], repo_path, input=input, timeout=timeout)
+        returncode = 0
+    except subprocess.CalledProcessError as e:
+        returncode = e.returncode
+        raise
+    except subprocess.TimeoutExpired:
+        returncode = None
+        raise
+    finally:
+        registry.record_subprocess(args[0], repo or os.path.basename(os.path.abspath(repo_path)),
+                                   time.monotonic() - started, returncode)
+    return result.stdout.strip() if strip else result.stdout
+
+def resolve(repo_path, rev):
+    """Return the object id for a revision, or None if it does not exist."""
+    try:
+        return run_git(["rev-parse", "--verify", "-q", rev], repo_path) or None
+    except subprocess.CalledProcessError:
+        return None
+
+def hash_blob(repo_path, content):
+    """Write content into the object database and return its blob id."""
+    return run_git(["hash-object", "-w", "--stdin"], repo_path, input=content)
+
+def read_tree_entries(repo_path, tree):
+    """Return {name: (mode, type, oid)} for the top level of a tree."""
+    entries = {}
+    if not tree:
+        return entries
+    output = run_git(["ls-tree", "-z", tree], repo_path)
+    for record in output.split("\0"):
+        if not record:
+            continue
+        meta, name = record.split("\t", 1)
+        mode, obj_type, oid = meta.split()
+        entries[name] = (mode, obj_type, oid)
+    return entries
+
+def build_tree(repo_path, base_tree, changes):
+    """Return a new tree id with changes applied on top of base_tree.
+
+    changes maps a path component either to a blob id or to a nested dict of
+    changes for a subdirectory. Only the directories on the changed paths are
+    listed and rewritten, so the cost does not depend on the size of the tree.
+    """
+    entries = read_tree_entries(repo_path, base_tree)
+    for name, change in changes.items():
+        current = entries.get(name)
+        if isinstance(change, dict):
+            sub_base = current[2] if current and current[1] == "tree" else None
+            entries[name] = ("040000", "tree", build_tree(repo_path, sub_base, change))
+        else:
+            mode = current[0] if current and current[1] == "blob" else "100644"
+            entries[name] = (mode, "blob", change)
+
+    listing = "".join(f"{mode} {obj_type} {oid}\t{name}\0" for name, (mode, obj_type, oid) in entries.items())
+    return run_git(["mktree", "-z"], repo_path, input=listing)
+
+def _nest(paths_to_blobs):
+    """Turn {"a/b/c.txt": oid} into {"a": {"b": {"c.txt": oid}}}."""
+    nested = {}
+    for path, oid in paths_to_blobs.items():
+        parts = path.replace(os.sep, "/").split("/")
+        node = nested
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = oid
+    return nested
+
+def create_commit(repo_path, files, message, parent="HEAD"):
+    """Create a commit with {relative_path: content} applied on top of parent, without moving any ref.
+
+    Writes the blobs, rebuilds only the affected trees and creates the commit
+    with commit-tree. Returns (commit, parent_commit); commit is None if the
+    files were already up to date in parent. Only an unborn HEAD yields a
+    root commit: any other parent that does not resolve raises ValueError.
+    """
+    if parent is None:
+        raise ValueError("create_commit needs a parent revision")
+    parent_commit = resolve(repo_path, f"{parent}^{{commit}}")
+    if parent_commit is None and (parent != "HEAD" or resolve(repo_path, "HEAD") is not None):
+        raise ValueError(f"Parent revision {parent!r} does not resolve to a commit")
+    base_tree = resolve(repo_path, f"{parent_commit}^{{tree}}") if parent_commit else None
+
+    blobs = {path: hash_blob(repo_path, content) for path, content in files.items()}
+    tree = build_tree(repo_path, base_tree, _nest(blobs))
+    if tree == base_tree:
+        return None, parent_commit
+
+    commit_args = ["commit-tree", tree, "-m", message]
+    if parent_commit:
+        commit_args += ["-p", parent_commit]
+    return run_git(commit_args, repo_path), parent_commit
+
+def commit_files(repo_path, files, message, parent="HEAD", sync_worktree=True):
+    """Commit {relative_path: content} directly on top of parent without scanning the working tree.
+
+    Creates the commit with create_commit and moves HEAD with a
+    compare-and-swap update-ref. With sync_worktree the files are also
+    written to disk and only their index entries are refreshed, so later
+    porcelain commands see a clean checkout. Returns the new commit id, or
+    None if the files were already up to date.
+    """
+    commit, parent_commit = create_commit(repo_path, files, message, parent)
+    if not commit:
+        return None
+
+    # Fails instead of clobbering if HEAD moved underneath us
+    run_git(["update-ref", "-m", f"commit: {message}", "HEAD", commit, parent_commit or ""], repo_path)
+
+    if sync_worktree:
+        for path, content in files.items():
+            full_path = os.path.join(repo_path, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w', encoding="utf-8") as f:
+                f.write(content)
+        run_git(["update-index", "--add", "--", *files], repo_path)
+
+    return commit
+
+def remote_tip(repo_path):
+    """Ask the remote where the upstream branch is now (one ls-remote, no fetch); None if unknown."""
+    try:
+        branch = run_git(["symbolic-ref", "-q", "HEAD"], repo_path)
+        upstream = run_git(["for-each-ref", "--format=%(upstream:remotename) %(upstream:remoteref)", branch], repo_path)
+        remote, _, ref = upstream.partition(" ")
+        if not remote or not ref:
+            return None
+        output = run_git(["ls-remote", remote, ref], repo_path)
+    except subprocess.CalledProcessError:
+        return None
+    for line in output.splitlines():
+        oid, _, name = line.partition("\t")
+        if name == ref:
+            return oid
+    return None
+
+def count_unpushed(repo_path):
+    """Return how many local commits are ahead of the upstream branch (0 without an upstream)."""
+    try:
+        return int(run_git(["rev-list", "--count", "@{upstream}..HEAD"], repo_path) or 0)
+    except subprocess.CalledProcessError:
+        return 0
+
+def oldest_unpushed_time(repo_path):
+    """Return the committer time of the oldest commit in @{upstream}..HEAD, or None if there is none."""
+    try:
+        times = run_git(["log", "--format=%ct", "@{upstream}..HEAD"], repo_path).split()
+    except subprocess.CalledProcessError:
+        return None
+    return min(map(int, times)) if times else None
+
+def staged_changes(repo_path, paths=()):
+    """Return the paths whose index entry differs from HEAD, parsed from git status --porcelain -z.
+
+    Limiting the status to paths keeps git from walking the rest of the working tree.
+    """
+    output = run_git(["status", "--porcelain", "-z", "--untracked-files=no", "--", *paths], repo_path, strip=False)
+    changed = []
+    records = iter(output.split("\0"))
+    for record in records:
+        if len(record) < 4:
+            continue
+        index_status, path = record[0], record[3:]
+        if index_status in "RC":
+            next(records, None)  # Renames and copies carry the original path as an extra record
+        if index_status not in " ?!":
+            changed.append(path)
+    return changed
+
+def read_blob(repo_path, rev, path):
+    """Return the content of path at rev, or None if it does not exist there."""
+    try:
+        return run_git(["cat-file", "blob", f"{rev}:{path}"], repo_path, strip=False)
+    except subprocess.CalledProcessError:
+        return None
+
+def matches_any(path, patterns):
+    """True if path matches one of the gitattributes-style patterns (e.g. "commit_log/**")."""
+    return any(fnmatch.fnmatchcase(path, pattern.lstrip("/")) for pattern in patterns)
+
+def register_merge_drivers(repo_path, union_patterns=(), keep_patterns=()):
+    """Let rebases merge the bot's files without conflicts.
+
+    Append-only files get git's built-in union driver, so concurrent appends
+    from several machines are both kept. Files the bot simply overwrites
+    (like timestamp.txt) get a "bot-keep" driver that keeps the version
+    already on the branch being rebuilt. The attributes go to
+    .git/info/attributes, so nothing has to be committed to the repository.
+    """
+    run_git(["config", "merge.bot-keep.name", "keep the current version of a bot-written file"], repo_path)
+    run_git(["config", "merge.bot-keep.driver", "true"], repo_path)
+
+    attributes_path = os.path.join(repo_path, run_git(["rev-parse", "--git-path", "info/attributes"], repo_path))
+    try:
+        with open(attributes_path, encoding="utf-8") as f:
+            existing = set(f.read().splitlines())
+    except FileNotFoundError:
+        existing = set()
+    wanted = [f"{pattern} merge=union" for pattern in union_patterns]
+    wanted += [f"{pattern} merge=bot-keep" for pattern in keep_patterns]
+    missing = [line for line in wanted if line not in existing]
+    if missing:
+        os.makedirs(os.path.dirname(attributes_path), exist_ok=True)
+        with open(attributes_path, 'a', encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in missing))
+
+def merge_appended(base, local, upstream):
+    """Return upstream with the lines the bot appended locally (relative to base) added at the end."""
+    if local.startswith(base):
+        suffix = local[len(base):]
+    else:
+        # History was rewritten under us: keep every local line the remote does not have yet
+        known = set(upstream.splitlines())
+        suffix = "".join(line for line in local.splitlines(keepends=True) if line.rstrip("\n") not in known)
+    if not suffix or upstream.endswith(suffix):
+        return upstream
+    if upstream and not upstream.endswith("\n"):
+        upstream += "\n"
+    return upstream + suffix
+
+def abort_rebase_if_needed(repo_path):
+    """Abort a rebase left behind by a failed pull --rebase."""
+    for marker in ("rebase-merge", "rebase-apply"):
+        if os.path.exists(os.path.join(repo_path, run_git(["rev-parse", "--git-path", marker], repo_path))):
+            run_git(["rebase", "--abort"], repo_path)
+            return True
+    return False
+
+def rebuild_on_upstream(repo_path, paths, message, append_patterns=()):
+    """Replay the bot's unpushed changes as one commit on top of the freshly fetched upstream tip.
+
+    Replaces the old stash/pull/pop recovery: one fetch, one commit-tree and
+    a reset --keep, with no merge and so no conflict markers. paths are the
+    files written this cycle; paths changed by unpushed commits are added
+    automatically. Files matching append_patterns are treated as append-only
+    logs: the lines added locally since the merge base are appended to the
+    upstream version. Other files take the local version. Returns the new
+    HEAD commit. Without a HEAD, an upstream branch or a common history it
+    raises RuntimeError and leaves refs and the working tree alone.
+    """
+    abort_rebase_if_needed(repo_path)
+    head = resolve(repo_path, "HEAD")
+    if head is None or resolve(repo_path, "@{upstream}") is None:
+        raise RuntimeError(f"{repo_path}: no HEAD or no upstream branch to rebuild on")
+    run_git(["fetch", "--quiet"], repo_path)
+    upstream = resolve(repo_path, "@{upstream}")
+    try:
+        base = run_git(["merge-base", head, upstream], repo_path)
+    except subprocess.CalledProcessError:
+        raise RuntimeError(f"{repo_path}: HEAD and its upstream share no history") from None
+
+    pending = run_git(["diff", "--name-only", base, head], repo_path).splitlines()
+    files = {}
+    for path in sorted(set(pending) | set(paths)):
+        full_path = os.path.join(repo_path, path)
+        if not os.path.isfile(full_path):
+            continue
+        with open(full_path, encoding="utf-8") as f:
+            local = f.read()
+        if matches_any(path, append_patterns):
+            upstream_content = read_blob(repo_path, upstream, path) or ""
+            base_content = read_blob(repo_path, base, path) or ""
+            files[path] = merge_appended(base_content, local, upstream_content)
+        else:
+            files[path] = local
+
+    commit, _ = create_commit(repo_path, files, message, parent=upstream)
+    target = commit or upstream
+
+    # Put the bot's files back to HEAD so reset --keep can move the checkout; their
+    # content now lives in the new commit. Unrelated local edits are left alone.
+    if files:
+        run_git(["reset", "--quiet", "--", *files], repo_path)
+    tracked = [path for path in files if read_blob(repo_path, "HEAD", path) is not None]
+    if tracked:
+        run_git(["checkout", "HEAD", "--", *tracked], repo_path)
+    for path in files:
+        if path not in tracked:
+            os.remove(os.path.join(repo_path, path))
+    run_git(["reset", "--quiet", "--keep", target], repo_path)
+    return target
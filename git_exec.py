@@ -0,0 +1,92 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+COMMAND_TIMEOUT_SECONDS = 120  # Default cap on a single git subprocess (None = only the cycle deadline applies)
+KILL_GRACE_SECONDS = 5  # Time a timed-out process group gets to exit on SIGTERM before SIGKILL
+# Never wait for a human: no terminal credential prompts, no credential-manager dialogs
+NON_INTERACTIVE_ENV = {"GIT_TERMINAL_PROMPT": "0", "GCM_INTERACTIVE": "never"}
+
+_local = threading.local()
+
+@contextmanager
+def limits(deadline=None, command_timeout=None):
+    """Bound every command this thread runs inside the block.
+
+    deadline is an absolute time.monotonic() value shared by all of them
+    (nested blocks keep the earlier one); command_timeout replaces
+    COMMAND_TIMEOUT_SECONDS for each command. None leaves a setting as is.
+    """
+    previous = getattr(_local, "deadline", None), getattr(_local, "command_timeout", None)
+    if deadline is not None:
+        _local.deadline = deadline if previous[0] is None else min(previous[0], deadline)
+    if command_timeout is not None:
+        _local.command_timeout = command_timeout
+    try:
+        yield
+    finally:
+        _local.deadline, _local.command_timeout = previous
+
+def remaining():
+    """Seconds left before this thread's deadline, or None if there is none."""
+    at = getattr(_local, "deadline", None)
+    return None if at is None else at - time.monotonic()
+
+def _kill_group(proc):
+    """SIGTERM the whole process group (git cleans up its lock files), then SIGKILL what is left."""
+    if not hasattr(os, "killpg"):
+        proc.kill()
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait(KILL_GRACE_SECONDS)
+    except ProcessLookupError:
+        return
+    except subprocess.TimeoutExpired:
+        pass
+    # Helpers such as ssh or git-remote-https may outlive git itself
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+def run(cmd, cwd, input=None, timeout=None, shell=False):
+    """Run a command in its own process group and return a CompletedProcess.
+
+    The effective timeout is the smaller of timeout (by default the thread's
+    command timeout, else COMMAND_TIMEOUT_SECONDS) and what is left of the
+    thread's deadline. On expiry the whole process group is killed and
+    subprocess.TimeoutExpired is raised; a non-zero exit raises
+    subprocess.CalledProcessError as with check=True.
+    """
+    limit = timeout
+    if limit is None:
+        limit = getattr(_local, "command_timeout", None) or COMMAND_TIMEOUT_SECONDS
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            raise subprocess.TimeoutExpired(cmd, 0)
+        limit = left if limit is None else min(limit, left)
+
+    proc = subprocess.Popen(
+        cmd, cwd=cwd, shell=shell, env={**os.environ, **NON_INTERACTIVE_ENV},
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8",
+        start_new_session=True,  # No controlling terminal, and one group to kill on timeout
+    )
+    try:
+        stdout, stderr = proc.communicate(input, timeout=limit)
+    except subprocess.TimeoutExpired:
+        _kill_group(proc)
+        stdout, stderr = proc.communicate()
+        raise subprocess.TimeoutExpired(cmd, limit, output=stdout, stderr=stderr)
+    except BaseException:
+        _kill_group(proc)
+        proc.wait()
+        raise
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
@@ -0,0 +1,149 @@
+import subprocess
+import time
+
+import git_exec
+from git_backend import run_git
+from metrics import registry
+
+LOOSE_OBJECTS_THRESHOLD = 1000  # Repack once this many loose objects have piled up
+PACK_COUNT_THRESHOLD = 16  # ... or once there are this many packs
+MIN_IDLE_SECONDS = 120  # Only start when the next scheduled run is at least this far away
+SAFETY_MARGIN_SECONDS = 30  # Kill maintenance commands this long before the next scheduled run
+
+# Incremental steps, each with fallbacks tried in order. The geometric repack rolls loose objects
+# and small packs into bigger ones without rewriting the whole history; the commit-graph and
+# multi-pack-index keep rev-walks (pull --rebase, push) and object lookups fast as history and
+# packs accumulate. Shallow clones skip the commit-graph on their own.
+STEPS = [
+    ("repack", [
+        ["repack", "-d", "-l", "-q", "--geometric=2"],
+        # git < 2.32, and partial clones on some versions, reject --geometric: just pack the loose objects
+        ["repack", "-d", "-l", "-q"],
+    ]),
+    ("commit-graph", [["commit-graph", "write", "--reachable", "--split", "--no-progress"]]),
+    ("multi-pack-index", [["multi-pack-index", "write", "--no-progress"]]),
+]
+
+PRUNE_EXPIRE = "2.weeks.ago"  # Unreachable objects younger than this survive gc (git's own default)
+# Housekeeping auto-gc used to do, run on a clock because disable_auto_gc turns auto-gc off:
+# (name, seconds between runs, variants). loose-objects packs stray objects and pack-refs keeps
+# ref lookups cheap; the gc expires reflogs and prunes what rebuilt or re-shallowed history left
+# unreachable, which the geometric repack above never drops.
+PERIODIC_STEPS = [
+    ("housekeeping", 24 * 3600, [
+        ["maintenance", "run", "--quiet", "--task=loose-objects", "--task=pack-refs"],
+        # git < 2.34 has no pack-refs maintenance task
+        ["pack-refs", "--all", "--prune"],
+    ]),
+    ("gc", 30 * 24 * 3600, [["gc", "--quiet", f"--prune={PRUNE_EXPIRE}"]]),
+]
+
+def object_stats(repo_path):
+    """Return `git count-objects -v` as a dict of ints (count = loose objects, packs = pack files, ...)."""
+    stats = {}
+    for line in run_git(["count-objects", "-v"], repo_path).splitlines():
+        key, _, value = line.partition(":")
+        if value.strip().isdigit():
+            stats[key.strip()] = int(value)
+    return stats
+
+def due_reasons(stats):
+    """Return why a repository needs maintenance (an empty list if it does not)."""
+    reasons = []
+    if stats.get("count", 0) >= LOOSE_OBJECTS_THRESHOLD:
+        reasons.append(f"{stats['count']} loose objects")
+    if stats.get("packs", 0) >= PACK_COUNT_THRESHOLD:
+        reasons.append(f"{stats['packs']} packs")
+    return reasons
+
+def due_periodic(last_run, now=None):
+    """Return the PERIODIC_STEPS whose interval has passed since last_run ({name: time.time()})."""
+    now = time.time() if now is None else now
+    last_run = last_run or {}
+    return [step for step in PERIODIC_STEPS if now - last_run.get(step[0], 0) >= step[1]]
+
+def disable_auto_gc(repo_path):
+    """Stop git from running gc / maintenance in the foreground of a commit, pull or push.
+
+    Only safe together with maybe_maintain, whose PERIODIC_STEPS take over
+    reflog expiry, pruning and pack-refs.
+    """
+    run_git(["config", "maintenance.auto", "false"], repo_path)
+    run_git(["config", "gc.auto", "0"], repo_path)
+
+def restore_auto_gc(repo_path):
+    """Undo disable_auto_gc, handing gc back to git once the bot's maintenance is switched off."""
+    for key in ("maintenance.auto", "gc.auto"):
+        try:
+            run_git(["config", "--unset", key], repo_path)
+        except subprocess.CalledProcessError as e:
+            if e.returncode != 5:  # 5: the key was not set
+                raise
+
+def _probe(repo_path):
+    """Time the status scan the porcelain backend runs every cycle."""
+    started = time.monotonic()
+    run_git(["status", "--porcelain", "--untracked-files=no"], repo_path)
+    return time.monotonic() - started
+
+def _run_first_supported(repo_path, variants, timeout):
+    """Run the first command variant git accepts; re-raise the last failure if none does."""
+    for n, args in enumerate(variants):
+        try:
+            return run_git(args, repo_path, timeout=timeout)
+        except subprocess.CalledProcessError:
+            if n == len(variants) - 1:
+                raise
+
+def maybe_maintain(repo_path, until, repo=None, last_run=None):
+    """Run the maintenance steps that are due, if there is time before until.
+
+    The incremental STEPS run once a threshold is crossed; each of the
+    PERIODIC_STEPS runs when its interval has passed since last_run
+    ({name: time.time()}, as persisted by the caller). until is the
+    time.time() of the next scheduled run; every command is bounded so it
+    ends SAFETY_MARGIN_SECONDS before that. Returns a report dict (see
+    summarize) whose "periodic" entry holds the new last-run times to
+    persist, or None if nothing needed to run.
+    """
+    if until - time.time() < MIN_IDLE_SECONDS:
+        return None
+    budget = until - time.time() - SAFETY_MARGIN_SECONDS
+    before = object_stats(repo_path)
+    reasons = due_reasons(before)
+    periodic = due_periodic(last_run)
+    if not reasons and not periodic:
+        return None
+
+    steps = list(STEPS) if reasons else []
+    steps += [(name, variants) for name, _, variants in periodic]
+    reasons += [f"{name} due" for name, _, _ in periodic]
+    report = {"reasons": reasons, "before": before, "steps": {}}
+    started = time.monotonic()
+    with git_exec.limits(deadline=started + budget):
+        report["probe_before"] = _probe(repo_path)
+        for name, variants in steps:
+            step_started = time.monotonic()
+            with registry.span(name, repo, metric="bot_maintenance_duration_seconds"):
+                _run_first_supported(repo_path, variants, budget)
+            report["steps"][name] = time.monotonic() - step_started
+        report["probe_after"] = _probe(repo_path)
+    report["periodic"] = {name: time.time() for name, _, _ in periodic}
+    report["after"] = object_stats(repo_path)
+    report["duration"] = time.monotonic() - started
+
+    registry.inc("bot_maintenance_runs_total", repo=repo)
+    registry.observe("bot_maintenance_probe_seconds", report["probe_before"], repo=repo, when="before")
+    registry.observe("bot_maintenance_probe_seconds", report["probe_after"], repo=repo, when="after")
+    return report
+
+def summarize(report):
+    """Render a maintenance report as one log line."""
+    steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["steps"].items())
+    before, after = report["before"], report["after"]
+    return (
+        f"Maintenance ({'; '.join(report['reasons'])}): {steps}. "
+        f"Loose objects {before.get('count', 0)} -> {after.get('count', 0)}, "
+        f"packs {before.get('packs', 0)} -> {after.get('packs', 0)}, "
+        f"status {report['probe_before'] * 1000:.0f} ms -> {report['probe_after'] * 1000:.0f} ms."
+    )
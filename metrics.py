@@ -0,0 +1,186 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Histogram bucket upper bounds in seconds (Prometheus style, +Inf is implicit)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+SAMPLE_WINDOW = 1024  # Recent samples kept per histogram for the p50/p95 in the JSON summary
+
+HELP = {
+    "bot_subprocess_total": ("counter", "git subprocesses launched, by command and exit status."),
+    "bot_retries_total": ("counter", "Retried git operations, by reason."),
+    "bot_commits_total": ("counter", "Commit attempts, by outcome."),
+    "bot_phase_errors_total": ("counter", "Phases that ended with an exception."),
+    "bot_subprocess_duration_seconds": ("histogram", "Wall time of each git subprocess."),
+    "bot_phase_duration_seconds": ("histogram", "Wall time of each commit phase."),
+    "bot_commit_latency_seconds": ("histogram", "End-to-end time of one commit cycle for a repository."),
+    "bot_cycle_duration_seconds": ("histogram", "Wall time of a whole multi-repository cycle."),
+    "bot_maintenance_runs_total": ("counter", "Maintenance runs (repack, commit-graph, multi-pack-index)."),
+    "bot_maintenance_duration_seconds": ("histogram", "Wall time of each maintenance step."),
+    "bot_maintenance_probe_seconds": ("histogram", "git status time right before and after maintenance."),
+}
+
+class Histogram:
+    """Cumulative-bucket histogram that also keeps a window of recent samples for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def percentile(self, q):
+        """Return the q-th percentile (0-100) of the recent samples, or None if empty."""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Record one sample in a histogram."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, phase, repo=None, metric="bot_phase_duration_seconds"):
+        """Time a block as one phase; errors are counted and re-raised."""
+        started = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.inc("bot_phase_errors_total", phase=phase, repo=repo)
+            raise
+        finally:
+            self.observe(metric, time.monotonic() - started, phase=phase, repo=repo)
+
+    def record_subprocess(self, command, repo, duration, returncode):
+        """Count one git subprocess and record how long it took."""
+        status = "ok" if returncode == 0 else "timeout" if returncode is None else "error"
+        self.inc("bot_subprocess_total", command=command, repo=repo, status=status)
+        self.observe("bot_subprocess_duration_seconds", duration, command=command, repo=repo)
+
+    def counter_total(self, name, **labels):
+        """Sum a counter over every label set that matches labels."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        with self._lock:
+            return sum(v for (n, key), v in self._counters.items() if n == name and wanted <= set(key))
+
+    def samples(self, name, **labels):
+        """Return the recent samples of every histogram series that matches labels."""
+        wanted = {(k, str(v)) for k, v in labels.items()}
+        with self._lock:
+            return [v for (n, key), h in self._histograms.items() if n == name and wanted <= set(key) for v in h.samples]
+
+    def reset(self):
+        """Drop every recorded metric."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (
+                f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                for k, v in pairs
+            )
+            return "{" + ",".join(escaped) + "}"
+
+        lines, described = [], set()
+
+        def describe(name, default_type):
+            if name in described:
+                return
+            described.add(name)
+            metric_type, text = HELP.get(name, (default_type, name))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                describe(name, "counter")
+                lines.append(f"{name}{fmt_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                describe(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{fmt_labels(labels, [('le', repr(float(bound)))])} {cumulative}")
+                lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{fmt_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{fmt_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Return counters and histogram statistics as plain JSON-serialisable data."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name, "labels": dict(labels), "count": h.count, "sum": round(h.sum, 6),
+                    "max": round(h.max, 6), "p50": h.percentile(50), "p95": h.percentile(95),
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def export(self, prometheus_path=None, json_path=None, extra=None):
+        """Atomically write the Prometheus text file and/or the JSON summary (None skips a format)."""
+        if prometheus_path:
+            _write_atomic(prometheus_path, self.to_prometheus())
+        if json_path:
+            data = {"generated_at": datetime.now().isoformat(timespec="seconds"), **(extra or {}), **self.summary()}
+            _write_atomic(json_path, json.dumps(data, indent=2, default=str) + "\n")
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# Process-wide registry shared by the bots and git_backend
+registry = MetricsRegistry()
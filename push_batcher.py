@@ -0,0 +1,65 @@
+import threading
+import time
+
+class PushBatcher:
+    """Track unpushed local commits per repository and decide when to sync them."""
+
+    def __init__(self):
+        self._pending = {}  # key -> [count, time.time() of the oldest pending commit]
+        self._lock = threading.Lock()
+
+    def seed(self, key, count, since=None):
+        """Start tracking commits that were already waiting locally (e.g. after a restart).
+
+        since is the time.time() of the oldest of them (its committer date),
+        so a restart does not reset the batch window; None means now.
+        """
+        with self._lock:
+            if count > 0 and key not in self._pending:
+                self._pending[key] = [count, time.time() if since is None else since]
+
+    def record(self, key):
+        """Record one new local commit and return the number now pending."""
+        with self._lock:
+            entry = self._pending.setdefault(key, [0, time.time()])
+            entry[0] += 1
+            return entry[0]
+
+    def pending(self, key):
+        """Return the number of local commits waiting to be pushed."""
+        with self._lock:
+            entry = self._pending.get(key)
+            return entry[0] if entry else 0
+
+    def pending_keys(self):
+        """Return the keys that have commits waiting to be pushed."""
+        with self._lock:
+            return list(self._pending)
+
+    def is_due(self, key, max_commits=1, max_age_seconds=None):
+        """Return True if the pending commits for key should be synced now.
+
+        A repository is due once it has max_commits pending commits, or once
+        its oldest pending commit is older than max_age_seconds. max_commits=1
+        means every commit is pushed right away.
+        """
+        with self._lock:
+            entry = self._pending.get(key)
+            if not entry:
+                return False
+            if entry[0] >= max(1, max_commits):
+                return True
+            return max_age_seconds is not None and time.time() - entry[1] >= max_age_seconds
+
+    def flush_deadline(self, key, max_age_seconds=None):
+        """Return the time.time() at which key's pending commits reach max_age_seconds, or None."""
+        with self._lock:
+            entry = self._pending.get(key)
+            if not entry or max_age_seconds is None:
+                return None
+            return entry[1] + max_age_seconds
+
+    def clear(self, key):
+        """Forget the pending commits for key once they have been pushed."""
+        with self._lock:
+            self._pending.pop(key, None)
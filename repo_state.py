@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+
+class RepoStateIndex:
+    """Persist what the bot last knew about each repository so redundant git work can be skipped.
+
+    Each entry may hold:
+      cloned      -- the checkout was provisioned by the bot
+      local_head  -- HEAD right after the bot's last commit or sync
+      remote_ref  -- the upstream tracking ref right after the last fetch or push
+      last_push   -- timestamp of the last successful push
+      commits_since_reshallow -- pushed commits since a shallow clone was last cut back
+      merge_drivers -- the union / keep merge drivers are registered in the checkout
+      auto_gc_disabled -- foreground auto-gc is off because the bot runs maintenance itself
+      last_maintenance -- timestamp of the last idle-time repack / commit-graph / multi-pack-index run
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._state = {}
+
+    def get(self, name):
+        """Return a copy of the cached state for a repository (empty if unknown)."""
+        with self._lock:
+            return dict(self._state.get(name, {}))
+
+    def update(self, name, **fields):
+        """Merge fields into a repository's entry and write the index atomically."""
+        with self._lock:
+            self._state.setdefault(name, {}).update(fields)
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding="utf-8") as f:
+                json.dump(self._state, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def forget(self, name):
+        """Drop everything known about a repository (e.g. after it was re-cloned)."""
+        with self._lock:
+            self._state.pop(name, None)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(path):
+    """Return the shared index for a state file, loading it on first use."""
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = RepoStateIndex(path)
+        return _indexes[path]
@@ -0,0 +1,133 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+# What to do with runs that were missed while the bot was down (or busy)
+CATCH_UP_ONCE = "once"  # Run a missed job once right away, then continue from there
+CATCH_UP_ALL = "all"    # Replay every missed slot back to back (at most MAX_CATCH_UP of them)
+CATCH_UP_SKIP = "skip"  # Drop missed runs and wait for the next slot on the original cadence
+
+MAX_CATCH_UP = 10  # Upper bound on replayed slots with CATCH_UP_ALL
+
+class DeadlineScheduler:
+    """Keep a next-due timestamp per key in a heap and persist it so restarts resume the schedule."""
+
+    def __init__(self, state_file, catch_up=CATCH_UP_ONCE):
+        self.state_file = state_file
+        self.catch_up = catch_up
+        self._jobs = {}  # key -> {"interval": seconds, "next_due": timestamp, "last_run": timestamp}
+        self._heap = []  # (next_due, key); stale entries are skipped lazily
+        self._lock = threading.Lock()
+        self._saved = self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save(self):
+        """Atomically write the schedule to the state file."""
+        with self._lock:
+            state = {key: dict(job) for key, job in self._jobs.items()}
+        directory = os.path.dirname(os.path.abspath(self.state_file))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding="utf-8") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_file)
+
+    def _apply_catch_up(self, due, interval, now):
+        """Return the effective deadline for a job whose deadline may already have passed."""
+        if due >= now:
+            return due
+        if self.catch_up == CATCH_UP_ALL:
+            return max(due, now - MAX_CATCH_UP * interval)
+        if self.catch_up == CATCH_UP_SKIP:
+            return due + math.ceil((now - due) / interval) * interval
+        return now
+
+    def _push(self, key, due):
+        self._jobs[key]["next_due"] = due
+        heapq.heappush(self._heap, (due, key))
+
+    def add(self, key, interval_seconds, first_due=None):
+        """Register a job; a deadline persisted by a previous run wins over first_due.
+
+        If the interval was shortened since that run, the job is due one new
+        interval after its last run rather than at the old, later deadline.
+        """
+        now = time.time()
+        saved = self._saved.get(key, {})
+        due = saved.get("next_due", first_due if first_due is not None else now)
+        if "next_due" in saved and saved.get("last_run") is not None:
+            due = min(due, saved["last_run"] + interval_seconds)
+        with self._lock:
+            self._jobs[key] = {"interval": interval_seconds, "next_due": due, "last_run": saved.get("last_run")}
+            self._push(key, self._apply_catch_up(due, interval_seconds, now))
+
+    def _peek(self):
+        while self._heap:
+            due, key = self._heap[0]
+            job = self._jobs.get(key)
+            if job and job["next_due"] == due:
+                return due, key
+            heapq.heappop(self._heap)
+        return None
+
+    def next_due(self):
+        """Return (timestamp, key) for the earliest deadline, or None when nothing is scheduled."""
+        with self._lock:
+            return self._peek()
+
+    def pop_due(self, now=None):
+        """Remove and return every key whose deadline has passed, earliest first."""
+        now = time.time() if now is None else now
+        due_keys = []
+        with self._lock:
+            while True:
+                entry = self._peek()
+                if not entry or entry[0] > now:
+                    break
+                heapq.heappop(self._heap)
+                due_keys.append(entry[1])
+        return due_keys
+
+    def wait(self, idle=None, wake_by=None):
+        """Sleep until the earliest deadline and return the keys that are due (empty if none are scheduled).
+
+        wake_by (a time.time(), e.g. when a push batch runs out of time) ends
+        the sleep earlier for work outside the schedule; the keys due by then
+        are returned, possibly none. If the wake-up is still ahead,
+        idle(wake_up) runs first so the gap can be used for background work;
+        it should return before then.
+        """
+        entry = self.next_due()
+        wake_ups = [at for at in (entry[0] if entry else None, wake_by) if at is not None]
+        if not wake_ups:
+            return []
+        until = min(wake_ups)
+        if idle and until > time.time():
+            idle(until)
+        delay = until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return self.pop_due()
+
+    def complete(self, key, retry_after=None):
+        """Schedule the next run of key after it ran; retry_after overrides the interval after a failure."""
+        now = time.time()
+        with self._lock:
+            job = self._jobs[key]
+            job["last_run"] = now
+            if retry_after is not None:
+                due = now + retry_after
+            else:
+                due = self._apply_catch_up(job["next_due"] + job["interval"], job["interval"], now)
+            self._push(key, due)
+        self.save()
+        return due
@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+from datetime import datetime
+
+from git_backend import run_git
+
+# Layouts understood by bot.py and bot2.py
+FLAT = "flat"        # One ever-growing file (bot.py) or one new top-level file per run (bot2.py)
+SHARDED = "sharded"  # Size-capped segments under <stem>/YYYY/MM/DD-NNN<ext>
+
+SEGMENT_MAX_BYTES = 256 * 1024  # Roll to a new segment once the current one would exceed this
+
+_SEGMENT_RE = re.compile(r"^(\d{2})-(\d{3})")
+_LINE_DATE_RE = re.compile(r"(\d{4})-(\d{2})-(\d{2}) \d{2}:\d{2}:\d{2}")
+_CONFLICT_MARKERS = ("<<<<<<< ", "||||||| ", "=======", ">>>>>>> ")  # Lines written by unresolved merges
+_NAME_DATE_RE = re.compile(r"(\d{4})(\d{2})(\d{2})\d{6}")
+
+def split_name(file_name):
+    """Return (stem, ext) for a file name or a "name_{}.txt" template."""
+    name, ext = os.path.splitext(file_name.replace("{}", ""))
+    return name.rstrip("_-.") or "segments", ext or ".txt"
+
+def segment_path(stem, when, seq, ext=".txt"):
+    """Return the relative path of segment number seq for the day of when."""
+    return "/".join([stem, f"{when:%Y}", f"{when:%m}", f"{when:%d}-{seq:03d}{ext}"])
+
+def current_segment(repo_path, stem, incoming_bytes=0, when=None, ext=".txt", max_bytes=SEGMENT_MAX_BYTES):
+    """Return the relative path to append incoming_bytes to, rolling over when the cap would be exceeded.
+
+    Only the month directory for when is listed, so the cost stays bounded
+    however long the bot has been running.
+    """
+    when = when or datetime.now()
+    month_dir = os.path.join(repo_path, stem, f"{when:%Y}", f"{when:%m}")
+    day, seq = f"{when:%d}", -1
+    try:
+        for name in os.listdir(month_dir):
+            match = _SEGMENT_RE.match(name)
+            if match and match.group(1) == day and name.endswith(ext):
+                seq = max(seq, int(match.group(2)))
+    except FileNotFoundError:
+        pass
+    if seq < 0:
+        return segment_path(stem, when, 0, ext)
+
+    path = segment_path(stem, when, seq, ext)
+    size = os.path.getsize(os.path.join(repo_path, path))
+    if size and size + incoming_bytes > max_bytes:
+        path = segment_path(stem, when, seq + 1, ext)
+    return path
+
+def append_records(repo_path, stem, when, records, ext=".txt", max_bytes=SEGMENT_MAX_BYTES):
+    """Append text records for one day, starting new segments as each one fills up."""
+    written = set()
+    batch, batch_bytes, path = [], 0, None
+    for record in records:
+        size = len(record.encode("utf-8"))
+        if path is None or (batch and batch_bytes + size > max_bytes):
+            if batch:
+                _append(repo_path, path, batch)
+                written.add(path)
+            path = current_segment(repo_path, stem, size, when, ext, max_bytes)
+            existing = os.path.join(repo_path, path)
+            batch, batch_bytes = [], os.path.getsize(existing) if os.path.exists(existing) else 0
+        batch.append(record)
+        batch_bytes += size
+    if batch:
+        _append(repo_path, path, batch)
+        written.add(path)
+    return sorted(written)
+
+def _append(repo_path, path, records):
+    full_path = os.path.join(repo_path, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'a', encoding="utf-8") as f:
+        f.write("".join(records))
+
+def migrate_append_log(repo_path, file_name, max_bytes=SEGMENT_MAX_BYTES):
+    """Move an append-only log (e.g. commit_log.txt) into dated segments; returns the paths written.
+
+    Each line goes to the day of the first timestamp it contains; lines
+    without one follow the line before them. Conflict markers left behind
+    by past stash/pull/pop recoveries are dropped.
+    """
+    source = os.path.join(repo_path, file_name)
+    if not os.path.exists(source):
+        return []
+    stem, ext = split_name(file_name)
+
+    by_day, day = {}, None
+    with open(source, encoding="utf-8", errors="replace") as f:
+        lines = f.readlines()
+    for line in lines:
+        if line.startswith(_CONFLICT_MARKERS):
+            continue
+        match = _LINE_DATE_RE.search(line)
+        if match:
+            day = datetime(*map(int, match.groups()))
+        by_day.setdefault(day, []).append(line if line.endswith("\n") else line + "\n")
+
+    # Lines before the first timestamp join the first dated day (or today if none)
+    undated = by_day.pop(None, [])
+    if undated:
+        first = min(by_day) if by_day else datetime.now()
+        by_day[first] = undated + by_day.get(first, [])
+
+    written = []
+    for when in sorted(by_day):
+        written += append_records(repo_path, stem, when, by_day[when], ext, max_bytes)
+    os.remove(source)
+    return written
+
+def migrate_per_run_files(repo_path, template, max_bytes=SEGMENT_MAX_BYTES):
+    """Fold per-run files such as dummy_file_<timestamp>.txt into dated segments; returns the files removed."""
+    prefix, suffix = template.split("{}", 1)
+    stem, ext = split_name(template)
+    runs = []
+    for entry in os.scandir(repo_path):
+        if not entry.is_file() or not entry.name.startswith(prefix) or not entry.name.endswith(suffix):
+            continue
+        stamp = entry.name[len(prefix):len(entry.name) - len(suffix)]
+        match = _NAME_DATE_RE.fullmatch(stamp)
+        when = datetime(*map(int, match.groups())) if match else datetime.fromtimestamp(entry.stat().st_mtime)
+        runs.append((when, stamp, entry.name))
+
+    by_day = {}
+    for when, _, name in sorted(runs):
+        with open(os.path.join(repo_path, name), encoding="utf-8", errors="replace") as f:
+            content = f.read()
+        by_day.setdefault(when.replace(hour=0, minute=0, second=0), []).append(
+            content if content.endswith("\n") else content + "\n"
+        )
+    for when in sorted(by_day):
+        append_records(repo_path, stem, when, by_day[when], ext, max_bytes)
+    for _, _, name in runs:
+        os.remove(os.path.join(repo_path, name))
+    return [name for _, _, name in runs]
+
+def migration_pathspecs(file_name):
+    """Return the pathspecs a migration of file_name (or a per-run template) reads and writes."""
+    stem, _ = split_name(file_name)
+    if "{}" in file_name:
+        prefix, suffix = file_name.split("{}", 1)
+        return [f":(glob){prefix}*{suffix}", f"{stem}/"]
+    return [file_name, f"{stem}/"]
+
+def _changed_paths(repo_path, pathspecs):
+    """Return the paths under pathspecs that differ from HEAD, untracked files included."""
+    output = run_git(["status", "--porcelain", "-z", "--untracked-files=all", "--", *pathspecs], repo_path, strip=False)
+    return [record[3:] for record in output.split("\0") if record]
+
+def migrate_repo(repo_path, file_names, message="Migrate bot files to sharded storage layout"):
+    """Run the one-shot migration for each file name or template and commit the result once.
+
+    Only the migrated files and their segment directories are staged; the
+    migration refuses to start if any of them has uncommitted changes.
+    """
+    pathspecs = [spec for file_name in file_names for spec in migration_pathspecs(file_name)]
+    if not pathspecs:
+        return
+    dirty = _changed_paths(repo_path, pathspecs)
+    if dirty:
+        raise RuntimeError(f"Uncommitted changes in {', '.join(dirty)}; commit or stash them before migrating")
+
+    for file_name in file_names:
+        if "{}" in file_name:
+            moved = migrate_per_run_files(repo_path, file_name)
+            print(f"{file_name}: folded {len(moved)} files into segments")
+        else:
+            written = migrate_append_log(repo_path, file_name)
+            print(f"{file_name}: split into {len(written)} segments")
+
+    changed = _changed_paths(repo_path, pathspecs)
+    if changed:
+        run_git(["add", "-A", "--", *changed], repo_path)
+        run_git(["commit", "-m", message, "--", *changed], repo_path)
+        print(f"Committed migration in {repo_path}")
+    else:
+        print(f"Nothing to migrate in {repo_path}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print('Usage: python storage_layout.py <repo_path> <file_name | "template_{}.txt"> [...]')
+        sys.exit(1)
+    try:
+        migrate_repo(sys.argv[1], sys.argv[2:])
+    except RuntimeError as e:
+        print(e)
+        sys.exit(1)
@@ -0,0 +1,112 @@
+"""Fixtures that build local bare "remote" repositories and point the bots at clones of them."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# The bots are flat top-level modules; make them importable however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+import bot2
+from backoff import RetryPolicy
+from push_batcher import PushBatcher
+
+def git(cwd, *args):
+    """Run git in cwd and return its stripped stdout (raises on failure)."""
+    result = subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+def url(path):
+    return "file://" + str(path)
+
+@pytest.fixture(autouse=True)
+def isolated_git(tmp_path, monkeypatch):
+    """Keep the user's git config out of the tests and give commits a fixed identity."""
+    config = tmp_path / "gitconfig"
+    config.write_text("[init]\n\tdefaultBranch = main\n[protocol \"file\"]\n\tallow = always\n")
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", str(config))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    for role in ("AUTHOR", "COMMITTER"):
+        monkeypatch.setenv(f"GIT_{role}_NAME", "Test")
+        monkeypatch.setenv(f"GIT_{role}_EMAIL", "test@example.invalid")
+
+@pytest.fixture
+def remote(tmp_path):
+    """A bare repository whose main branch has one commit with README and src1-3.txt."""
+    path = tmp_path / "remote.git"
+    git(tmp_path, "init", "--quiet", "--bare", str(path))
+    git(path, "config", "uploadpack.allowFilter", "true")
+    seed = tmp_path / "seed"
+    git(tmp_path, "clone", "--quiet", url(path), str(seed))
+    (seed / "README").write_text("fixture\n")
+    for n in range(1, 4):
+        (seed / f"src{n}.txt").write_text(f"source {n}\n")
+    git(seed, "add", ".")
+    git(seed, "commit", "--quiet", "-m", "Initial commit")
+    git(seed, "push", "--quiet", "origin", "HEAD:main")
+    return path
+
+@pytest.fixture
+def make_clone(tmp_path, remote):
+    """Return a function that clones the remote into tmp_path/<name> (extra clone args optional)."""
+    def make_clone(name="clone", args=()):
+        path = tmp_path / name
+        git(tmp_path, "clone", "--quiet", *args, url(remote), str(path))
+        return path
+    return make_clone
+
+@pytest.fixture
+def push_from_other(tmp_path, remote):
+    """Return a function that appends a line to a file from a second clone and pushes it."""
+    other = tmp_path / "other"
+
+    def push_from_other(name, line):
+        if not other.exists():
+            git(tmp_path, "clone", "--quiet", url(remote), str(other))
+        git(other, "pull", "--quiet")
+        with open(other / name, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        git(other, "add", name)
+        git(other, "commit", "--quiet", "-m", f"Other clone appends to {name}")
+        git(other, "push", "--quiet")
+        return git(other, "rev-parse", "HEAD")
+    return push_from_other
+
+@pytest.fixture
+def single_bot(tmp_path, make_clone, monkeypatch):
+    """bot.py pointed at a fresh clone, with state, logs and metrics under tmp_path."""
+    clone = make_clone()
+    monkeypatch.setattr(bot, "REPO_PATH", str(clone))
+    monkeypatch.setattr(bot, "LOG_FILE", str(tmp_path / "bot_log.txt"))
+    monkeypatch.setattr(bot, "REPO_STATE_FILE", str(tmp_path / "bot_state.json"))
+    monkeypatch.setattr(bot, "SCHEDULE_STATE_FILE", str(tmp_path / "bot_schedule.json"))
+    monkeypatch.setattr(bot, "METRICS_PROM_FILE", None)
+    monkeypatch.setattr(bot, "METRICS_JSON_FILE", None)
+    monkeypatch.setattr(bot, "_batcher", PushBatcher())
+    monkeypatch.setattr(bot, "_retry", RetryPolicy())
+    return bot
+
+@pytest.fixture
+def multi_bot(tmp_path, remote, monkeypatch):
+    """bot2.py managing one repository (the remote fixture) under tmp_path/base."""
+    base = tmp_path / "base"
+    monkeypatch.setattr(bot2, "BASE_PATH", str(base))
+    monkeypatch.setattr(bot2, "LOG_FILE", str(tmp_path / "multi_repo_bot_log.txt"))
+    monkeypatch.setattr(bot2, "REPO_STATE_FILE", str(tmp_path / "multi_repo_bot_state.json"))
+    monkeypatch.setattr(bot2, "SCHEDULE_STATE_FILE", str(tmp_path / "multi_repo_bot_schedule.json"))
+    monkeypatch.setattr(bot2, "SHARED_OBJECTS_PATH", str(tmp_path / "shared-objects.git"))
+    monkeypatch.setattr(bot2, "METRICS_PROM_FILE", None)
+    monkeypatch.setattr(bot2, "METRICS_JSON_FILE", None)
+    monkeypatch.setattr(bot2, "REPOSITORIES", [
+        {"url": url(remote), "name": "repo", "dummy_file": "dummy_file_{}.txt"},
+    ])
+    monkeypatch.setattr(bot2, "_batcher", PushBatcher())
+    monkeypatch.setattr(bot2, "_retry", RetryPolicy())
+    return bot2
+
+def checkout_of(multi_bot, repo=None):
+    """Path of bot2's checkout for a repository (the first configured one by default)."""
+    repo = repo or multi_bot.REPOSITORIES[0]
+    return os.path.join(multi_bot.BASE_PATH, repo["name"])
@@ -0,0 +1,43 @@
+import time
+
+import pytest
+
+from backoff import RetryPolicy
+from scheduler import DeadlineScheduler
+
+def test_delays_double_with_jitter_up_to_the_cap():
+    policy = RetryPolicy()
+    for n, base_delay in enumerate([10, 20, 40, 50, 50], start=1):
+        delay = policy.failure("r", 10, 50)
+        assert base_delay / 2 <= delay <= base_delay
+        assert policy.failures("r") == n
+    policy.success("r")
+    assert policy.failures("r") == 0
+    assert 5 <= policy.failure("r", 10, 50) <= 10
+
+def test_breaker_parks_after_threshold_and_closes_on_success():
+    policy = RetryPolicy()
+    for _ in range(2):
+        assert not policy.parked("r")
+        policy.failure("r", 10, 50, threshold=3, park_seconds=600)
+    assert policy.failure("r", 10, 50, threshold=3, park_seconds=600) == 600
+    assert policy.parked("r") and not policy.parked("other")
+    policy.success("r")
+    assert not policy.parked("r")
+
+def test_failing_repo_is_parked_while_healthy_repo_keeps_its_interval(multi_bot, tmp_path):
+    scheduler = DeadlineScheduler(str(tmp_path / "schedule.json"))
+    scheduler.add("good", 3600)
+    scheduler.add("bad", 3600)
+    good_deadlines = [scheduler._jobs["good"]["next_due"]]
+    for _ in range(multi_bot.BREAKER_THRESHOLD):
+        # Run both jobs back to back, as if each retry of the failing one had come due
+        now = time.time()
+        good_deadlines.append(scheduler.complete("good", retry_after=multi_bot.retry_delay("good", "committed")))
+        due_bad = scheduler.complete("bad", retry_after=multi_bot.retry_delay("bad", "failed"))
+
+    assert multi_bot._retry.parked("bad") and not multi_bot._retry.parked("good")
+    assert multi_bot._retry.failures("bad") == multi_bot.BREAKER_THRESHOLD
+    assert due_bad >= now + multi_bot.BREAKER_PARK_SECONDS
+    # The healthy repository stays on its own cadence throughout
+    assert [later - earlier for earlier, later in zip(good_deadlines, good_deadlines[1:])] == pytest.approx([3600] * multi_bot.BREAKER_THRESHOLD)
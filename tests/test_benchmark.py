@@ -0,0 +1,28 @@
+import benchmark
+
+def test_summary_counts_only_attempts_that_made_a_commit():
+    statuses = ["committed", "deferred", "recovered", "failed", "skipped", "postponed", "timed_out", "committed"]
+    row = benchmark._summarize("bot2", {}, [0.1] * len(statuses), 2.0, statuses, 40, 0, 5000)
+    assert (row["attempts"], row["commits"], row["failures"]) == (8, 4, 4)
+    assert row["outcomes"] == {"committed": 2, "deferred": 1, "failed": 1, "postponed": 1, "recovered": 1,
+                               "skipped": 1, "timed_out": 1}
+    assert row["commits_per_second"] == 2.0
+    assert row["subprocesses_per_commit"] == 10
+    assert row["disk_growth_bytes_per_1000_commits"] == 1250000
+
+def test_bench_bot_records_failed_attempts(single_bot, remote, tmp_path, monkeypatch):
+    for name in ("GIT_BACKEND", "STORAGE_LAYOUT", "BATCH_SIZE"):
+        monkeypatch.setattr(single_bot, name, getattr(single_bot, name))  # bench_bot reassigns them
+    outcomes = iter(["committed", RuntimeError("push failed"), "skipped"])
+
+    def make_commit():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(single_bot, "make_commit", make_commit)
+    combo = {"backend": single_bot.PORCELAIN, "layout": single_bot.FLAT, "batch_size": 1}
+
+    row = benchmark.bench_bot(str(tmp_path / "bench"), f"file://{remote}", combo, 3)
+    assert (row["attempts"], row["commits"], row["failures"]) == (3, 1, 2)
+    assert row["outcomes"] == {"committed": 1, "failed": 1, "skipped": 1}
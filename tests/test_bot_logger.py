@@ -0,0 +1,64 @@
+import gzip
+import json
+
+import bot_logger
+
+def _writer(tmp_path, **options):
+    options.setdefault("max_age_seconds", None)
+    return bot_logger.BufferedLogWriter(str(tmp_path / "bot.log"), **options)
+
+def _segments(tmp_path):
+    return sorted(tmp_path.glob("bot.log.*.gz"))
+
+def test_json_records_carry_repo_phase_and_duration(tmp_path):
+    writer = _writer(tmp_path, fmt=bot_logger.JSON)
+    writer.log("pushed", repo="repo", phase="push", duration=1.234567)
+    writer.log("plain")
+    writer.close()
+
+    first, second = [json.loads(line) for line in (tmp_path / "bot.log").read_text().splitlines()]
+    assert set(first) == {"time", "message", "repo", "phase", "duration"}
+    assert (first["message"], first["repo"], first["phase"], first["duration"]) == ("pushed", "repo", "push", 1.2346)
+    assert set(second) == {"time", "message"}
+
+def test_text_records_keep_the_original_format(tmp_path):
+    writer = _writer(tmp_path)
+    writer.log("pushed", repo="repo", phase="push", duration=1.0)
+    writer.log("plain")
+    writer.close()
+    first, second = (tmp_path / "bot.log").read_text().splitlines()
+    assert first.endswith(" - [repo] pushed") and second.endswith(" - plain")
+
+def test_size_rotation_compresses_the_old_segment(tmp_path):
+    writer = _writer(tmp_path, max_bytes=100)
+    for n in range(3):
+        writer.log(f"line {n} " + "x" * 100)
+        writer.flush()
+    writer.close()
+
+    segments = _segments(tmp_path)
+    assert len(segments) == 2
+    rotated = "".join(gzip.decompress(path.read_bytes()).decode() for path in segments)
+    assert "line 0" in rotated and "line 1" in rotated
+    assert "line 2" in (tmp_path / "bot.log").read_text()
+
+def test_rotation_keeps_only_backup_count_segments(tmp_path):
+    writer = _writer(tmp_path, max_bytes=10, backup_count=2)
+    for n in range(6):
+        writer.log(f"line {n} padding")
+        writer.flush()
+    writer.close()
+
+    segments = _segments(tmp_path)
+    assert len(segments) == 2
+    # The newest segments survive
+    assert [gzip.decompress(path.read_bytes()).decode().split()[4] for path in segments] == ["3", "4"]
+
+def test_bot_json_lines_name_the_repository(single_bot, monkeypatch):
+    monkeypatch.setattr(single_bot, "LOG_FORMAT", bot_logger.JSON)
+    single_bot.log_message("hello", phase="push")
+    bot_logger.get_writer(single_bot.LOG_FILE, bot_logger.JSON).close()
+
+    with open(single_bot.LOG_FILE, encoding="utf-8") as f:
+        entry = json.loads(f.read().splitlines()[-1])
+    assert entry["repo"] == "clone" and entry["phase"] == "push" and entry["message"] == "hello"
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+from conftest import checkout_of, git
+
+STRATEGIES = {
+    "full": {},
+    "shallow": {"depth": 1},
+    "blobless-sparse": {"filter": "blob:none", "sparse": True},
+    "shared": {"shared": True},
+    "all": {"depth": 1, "filter": "blob:none", "sparse": True, "shared": True},
+}
+
+@pytest.fixture
+def history(push_from_other):
+    """Give the remote a few commits so depth and filters have something to leave out."""
+    for n in range(5):
+        push_from_other("src1.txt", f"history {n}")
+
+@pytest.mark.parametrize("name", STRATEGIES)
+def test_strategy_clones_then_commits_and_pushes(name, multi_bot, remote, history, push_from_other, monkeypatch):
+    strategy = STRATEGIES[name]
+    monkeypatch.setattr(multi_bot, "CLONE_STRATEGY", strategy)
+    repo = multi_bot.REPOSITORIES[0]
+    path = checkout_of(multi_bot)
+
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert git(remote, "rev-parse", "main") == git(path, "rev-parse", "HEAD")
+
+    shallow = git(path, "rev-parse", "--is-shallow-repository") == "true"
+    assert shallow == bool(strategy.get("depth"))
+    if strategy.get("depth"):
+        assert int(git(path, "rev-list", "--count", "HEAD")) <= 2
+    assert (git(path, "config", "--default", "", "remote.origin.promisor") == "true") == bool(strategy.get("filter"))
+    assert os.path.exists(os.path.join(path, "src1.txt")) != bool(strategy.get("sparse"))
+    alternates = os.path.join(path, ".git", "objects", "info", "alternates")
+    assert os.path.exists(alternates) == bool(strategy.get("shared"))
+    if strategy.get("shared"):
+        assert git(multi_bot.SHARED_OBJECTS_PATH, "rev-parse", "refs/remotes/repo/main")
+
+    # Still works once the remote moves under the reduced clone
+    push_from_other("src2.txt", "moved")
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert git(remote, "rev-parse", "main") == git(path, "rev-parse", "HEAD")
+    assert git(path, "status", "--porcelain") == ""
+    git(remote, "fsck", "--connectivity-only")
+
+def test_reshallow_cuts_history_back_and_keeps_pushing(multi_bot, remote, history, monkeypatch):
+    monkeypatch.setattr(multi_bot, "CLONE_STRATEGY", {"depth": 1, "reshallow_every": 2})
+    repo = multi_bot.REPOSITORIES[0]
+    path = checkout_of(multi_bot)
+
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert multi_bot.state_index().get("repo")["commits_since_reshallow"] == 1
+    assert int(git(path, "rev-list", "--count", "HEAD")) == 2
+
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert multi_bot.state_index().get("repo")["commits_since_reshallow"] == 0
+    assert int(git(path, "rev-list", "--count", "HEAD")) == 1
+
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert git(remote, "rev-parse", "main") == git(path, "rev-parse", "HEAD")
+    assert int(git(remote, "rev-list", "--count", "main")) == 9
+
+def test_first_clone_runs_outside_the_cycle_deadline(multi_bot, remote, monkeypatch):
+    repo = multi_bot.REPOSITORIES[0]
+    path = checkout_of(multi_bot)
+    real_clone = multi_bot.clone_repo
+
+    def slow_clone(*args, **kwargs):
+        time.sleep(0.5)  # Outlives the deadline below
+        return real_clone(*args, **kwargs)
+    monkeypatch.setattr(multi_bot, "clone_repo", slow_clone)
+
+    assert multi_bot.process_repo_isolated(repo, time.monotonic() + 0.2) == "postponed"
+    assert git(path, "rev-parse", "HEAD") == git(remote, "rev-parse", "main")
+
+    # The next cycle reuses the checkout instead of cloning again
+    monkeypatch.setattr(multi_bot, "clone_repo", None)
+    assert multi_bot.process_repo_isolated(repo, time.monotonic() + 60) == "committed"
+    assert git(remote, "rev-parse", "main") == git(path, "rev-parse", "HEAD")
+
+def test_clone_timeout_logs_the_timeout(multi_bot, capsys, monkeypatch):
+    def timed_out(*args, **kwargs):
+        raise subprocess.TimeoutExpired(["git", "clone"], 0)
+    monkeypatch.setattr(multi_bot, "clone_repo", timed_out)
+
+    assert multi_bot.process_repo_isolated(multi_bot.REPOSITORIES[0]) == "failed"
+    assert not os.path.exists(checkout_of(multi_bot))
+    log = capsys.readouterr().out
+    assert "Failed to clone repository repo: Command '['git', 'clone']' timed out" in log
+    assert ": None" not in log
@@ -0,0 +1,162 @@
+import os
+import subprocess
+
+import pytest
+
+import git_backend
+from conftest import checkout_of, git
+from git_backend import create_commit, rebuild_on_upstream, register_merge_drivers
+
+APPEND_ONLY = ["/commit_log.txt", "/commit_log/**"]
+
+def _append(path, line):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def _tracked_files(clone):
+    return sorted(git(clone, "ls-tree", "-r", "--name-only", "HEAD").splitlines())
+
+def test_create_commit_refuses_missing_parent(make_clone):
+    clone = make_clone()
+    with pytest.raises(ValueError):
+        create_commit(str(clone), {"a.txt": "a\n"}, "message", parent=None)
+    with pytest.raises(ValueError):
+        create_commit(str(clone), {"a.txt": "a\n"}, "message", parent="refs/heads/missing")
+
+def test_create_commit_on_unborn_head_makes_root_commit(tmp_path):
+    git(tmp_path, "init", "--quiet", "fresh")
+    commit, parent = create_commit(str(tmp_path / "fresh"), {"a.txt": "a\n"}, "first")
+    assert parent is None
+    assert git(tmp_path / "fresh", "rev-list", "--parents", "-n1", commit) == commit
+
+def test_rebuild_keeps_both_sides_of_append_only_files(make_clone, remote, push_from_other):
+    clone = make_clone()
+    _append(clone / "commit_log.txt", "local committed")
+    git(clone, "add", "commit_log.txt")
+    git(clone, "commit", "--quiet", "-m", "local")
+    _append(clone / "commit_log.txt", "local uncommitted")
+    (clone / "README").write_text("unrelated local edit\n")
+    remote_head = push_from_other("commit_log.txt", "remote line")
+
+    target = rebuild_on_upstream(str(clone), ["commit_log.txt"], "retry", APPEND_ONLY)
+
+    assert git(clone, "rev-parse", "HEAD") == target
+    assert git(clone, "rev-parse", "HEAD^") == remote_head
+    log = git(clone, "show", "HEAD:commit_log.txt").splitlines()
+    assert log == ["remote line", "local committed", "local uncommitted"]
+    assert git(clone, "status", "--porcelain") == "M README"
+    assert _tracked_files(clone) == ["README", "commit_log.txt", "src1.txt", "src2.txt", "src3.txt"]
+
+def test_rebuild_without_upstream_leaves_branch_alone(make_clone):
+    clone = make_clone()
+    git(clone, "branch", "--unset-upstream")
+    _append(clone / "commit_log.txt", "local")
+    head = git(clone, "rev-parse", "HEAD")
+
+    with pytest.raises(RuntimeError, match="upstream"):
+        rebuild_on_upstream(str(clone), ["commit_log.txt"], "retry", APPEND_ONLY)
+    assert git(clone, "rev-parse", "HEAD") == head
+    assert (clone / "src1.txt").exists() and (clone / "commit_log.txt").exists()
+
+def test_rebuild_on_detached_head_leaves_checkout_alone(make_clone):
+    clone = make_clone()
+    git(clone, "checkout", "--quiet", "--detach")
+    head = git(clone, "rev-parse", "HEAD")
+    with pytest.raises(RuntimeError):
+        rebuild_on_upstream(str(clone), [], "retry", APPEND_ONLY)
+    assert git(clone, "rev-parse", "HEAD") == head
+
+def test_bot_recovery_without_upstream_keeps_history(single_bot):
+    clone = single_bot.REPO_PATH
+    git(clone, "branch", "--unset-upstream")
+    register_merge_drivers(clone, single_bot.append_only_patterns())
+    history_before = git(clone, "rev-list", "HEAD")
+
+    with pytest.raises(RuntimeError):
+        single_bot.run_once()
+
+    # The bot's commit sits on top of the untouched history; nothing was deleted
+    assert git(clone, "rev-list", "HEAD~1") == history_before
+    assert _tracked_files(clone) == ["README", "commit_log.txt", "src1.txt", "src2.txt", "src3.txt"]
+    assert all(os.path.exists(os.path.join(clone, f"src{n}.txt")) for n in range(1, 4))
+
+def _failing(multi_bot, monkeypatch, *commands):
+    """Make bot2's git_command fail once for each of the given commands."""
+    real = multi_bot.git_command
+    remaining = list(commands)
+
+    def git_command(cmd, repo_path):
+        if cmd in remaining:
+            remaining.remove(cmd)
+            raise subprocess.CalledProcessError(1, cmd, "", "injected failure")
+        return real(cmd, repo_path)
+    monkeypatch.setattr(multi_bot, "git_command", git_command)
+
+def test_recovery_before_any_content_is_not_a_success(multi_bot, remote, monkeypatch):
+    repo = multi_bot.REPOSITORIES[0]
+    remote_before = git(remote, "rev-parse", "main")
+    _failing(multi_bot, monkeypatch, "git pull")
+
+    assert multi_bot.make_commit_for_repo(repo) == "failed"
+    assert git(remote, "rev-parse", "main") == remote_before
+    assert git(checkout_of(multi_bot), "rev-parse", "HEAD") == remote_before
+
+def test_recovery_pushes_the_rebuilt_commit(multi_bot, remote, monkeypatch):
+    repo = multi_bot.REPOSITORIES[0]
+    remote_before = git(remote, "rev-parse", "main")
+    _failing(multi_bot, monkeypatch, "git push", "git pull --rebase")
+
+    assert multi_bot.make_commit_for_repo(repo) == "recovered"
+    head = git(checkout_of(multi_bot), "rev-parse", "HEAD")
+    assert head != remote_before
+    assert git(remote, "rev-parse", "main") == head
+    assert git(remote, "rev-parse", "main^") == remote_before
+
+def _commit_tree(clone, files, executable=()):
+    for path, content in files.items():
+        os.makedirs(os.path.dirname(clone / path), exist_ok=True)
+        (clone / path).write_text(content)
+    for path in executable:
+        os.chmod(clone / path, 0o755)
+    git(clone, "add", "--", *files)
+    git(clone, "commit", "--quiet", "-m", "fixture layout")
+
+def test_commit_files_nested_path_keeps_siblings(make_clone):
+    clone = make_clone()
+    _commit_tree(clone, {"a/x.txt": "x\n", "a/b/y.txt": "y\n"})
+
+    commit = git_backend.commit_files(str(clone), {"a/b/c.txt": "c\n"}, "nested")
+    assert git(clone, "rev-parse", "HEAD") == commit
+    assert _tracked_files(clone) == ["README", "a/b/c.txt", "a/b/y.txt", "a/x.txt", "src1.txt", "src2.txt", "src3.txt"]
+    assert git(clone, "show", "HEAD:a/b/c.txt") == "c"
+    assert git(clone, "status", "--porcelain") == ""
+
+def test_commit_files_keeps_executable_mode(make_clone):
+    clone = make_clone()
+    _commit_tree(clone, {"run.sh": "#!/bin/sh\n"}, executable=["run.sh"])
+
+    git_backend.commit_files(str(clone), {"run.sh": "#!/bin/sh\necho hi\n"}, "overwrite")
+    assert git(clone, "ls-tree", "HEAD", "run.sh").split()[0] == "100755"
+    assert git(clone, "status", "--porcelain") == ""
+
+def test_commit_files_unchanged_content_makes_no_commit(make_clone):
+    clone = make_clone()
+    head = git(clone, "rev-parse", "HEAD")
+    assert git_backend.commit_files(str(clone), {"src1.txt": "source 1\n"}, "no-op") is None
+    assert git(clone, "rev-parse", "HEAD") == head
+
+def test_commit_files_refuses_when_head_moved(make_clone, monkeypatch):
+    clone = make_clone()
+    real_create_commit = git_backend.create_commit
+
+    def racing_create_commit(*args, **kwargs):
+        result = real_create_commit(*args, **kwargs)
+        # Someone else commits between create_commit and update-ref
+        git(clone, "commit", "--quiet", "--allow-empty", "-m", "concurrent")
+        return result
+    monkeypatch.setattr(git_backend, "create_commit", racing_create_commit)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        git_backend.commit_files(str(clone), {"new.txt": "new\n"}, "racing")
+    assert git(clone, "log", "-1", "--format=%s") == "concurrent"
+    assert not (clone / "new.txt").exists()
@@ -0,0 +1,56 @@
+import os
+import subprocess
+import time
+
+import pytest
+
+import git_exec
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+def test_timeout_kills_the_whole_process_group(tmp_path):
+    pid_file = tmp_path / "child.pid"
+    # The shell forks a child that would outlive it if only the shell were killed
+    command = f"sleep 60 & echo $! > {pid_file}; wait"
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        git_exec.run(command, str(tmp_path), timeout=0.5, shell=True)
+    assert time.monotonic() - started < git_exec.KILL_GRACE_SECONDS
+
+    child = int(pid_file.read_text())
+    for _ in range(50):  # The orphaned child is reaped by init shortly after the kill
+        if not _alive(child):
+            break
+        time.sleep(0.1)
+    assert not _alive(child)
+
+def test_non_zero_exit_raises_with_stderr(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        git_exec.run(["git", "rev-parse", "HEAD"], str(tmp_path))
+    assert raised.value.returncode != 0 and "not a git repository" in raised.value.stderr
+
+def test_nested_limits_keep_the_earlier_deadline(tmp_path):
+    assert git_exec.remaining() is None
+    with git_exec.limits(deadline=time.monotonic() + 0.5):
+        with git_exec.limits(deadline=time.monotonic() + 60, command_timeout=60):
+            assert git_exec.remaining() < 1
+            started = time.monotonic()
+            with pytest.raises(subprocess.TimeoutExpired):
+                git_exec.run(["sleep", "5"], str(tmp_path))
+            assert time.monotonic() - started < 2
+        # The outer deadline has passed: later commands fail without being started
+        with pytest.raises(subprocess.TimeoutExpired) as raised:
+            git_exec.run(["true"], str(tmp_path))
+        assert raised.value.timeout == 0
+    assert git_exec.remaining() is None
+
+def test_command_timeout_applies_inside_a_looser_deadline(tmp_path):
+    with git_exec.limits(deadline=time.monotonic() + 60, command_timeout=0.3):
+        with pytest.raises(subprocess.TimeoutExpired) as raised:
+            git_exec.run(["sleep", "5"], str(tmp_path))
+    assert raised.value.timeout == 0.3
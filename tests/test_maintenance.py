@@ -0,0 +1,65 @@
+import os
+import subprocess
+import time
+
+import maintenance
+from conftest import checkout_of, git
+
+DAY = 24 * 3600
+
+def _write_blob(repo, content):
+    result = subprocess.run(["git", "hash-object", "-w", "--stdin"], cwd=repo, input=content,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+def test_due_periodic_follows_the_intervals():
+    now = time.time()
+    assert [name for name, _, _ in maintenance.due_periodic(None, now)] == ["housekeeping", "gc"]
+    assert maintenance.due_periodic({"housekeeping": now, "gc": now}, now) == []
+    due = maintenance.due_periodic({"housekeeping": now - 2 * DAY, "gc": now - 2 * DAY}, now)
+    assert [name for name, _, _ in due] == ["housekeeping"]
+
+def test_periodic_steps_prune_and_pack_refs(make_clone):
+    clone = make_clone()
+    stale = _write_blob(clone, "stale\n")  # Unreachable, and old enough to prune
+    stale_path = clone / ".git" / "objects" / stale[:2] / stale[2:]
+    month_ago = time.time() - 30 * DAY
+    os.utime(stale_path, (month_ago, month_ago))
+    fresh = _write_blob(clone, "fresh\n")
+
+    report = maintenance.maybe_maintain(str(clone), time.time() + 3600)
+    assert set(report["steps"]) == {"housekeeping", "gc"}
+    assert set(report["periodic"]) == {"housekeeping", "gc"}
+    assert not stale_path.exists()
+    git(clone, "cat-file", "-e", fresh)  # Younger than PRUNE_EXPIRE: kept
+    assert "refs/heads/main" in (clone / ".git" / "packed-refs").read_text()
+
+    assert maintenance.maybe_maintain(str(clone), time.time() + 3600, last_run=report["periodic"]) is None
+
+def test_restore_auto_gc_undoes_disable(make_clone):
+    clone = make_clone()
+    maintenance.restore_auto_gc(str(clone))  # Nothing to undo yet
+    maintenance.disable_auto_gc(str(clone))
+    assert git(clone, "config", "gc.auto") == "0"
+    maintenance.restore_auto_gc(str(clone))
+    assert git(clone, "config", "--default", "unset", "gc.auto") == "unset"
+    assert git(clone, "config", "--default", "unset", "maintenance.auto") == "unset"
+
+def test_idle_maintenance_persists_periodic_runs(multi_bot, monkeypatch):
+    repo = multi_bot.REPOSITORIES[0]
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert git(checkout_of(multi_bot), "config", "gc.auto") == "0"
+
+    multi_bot.idle_maintenance(time.time() + 3600)
+    periodic = multi_bot.state_index().get("repo")["periodic_maintenance"]
+    assert set(periodic) == {"housekeeping", "gc"}
+
+    # Nothing is due on the next idle gap
+    monkeypatch.setattr(maintenance, "_run_first_supported", None)
+    multi_bot.idle_maintenance(time.time() + 3600)
+    assert multi_bot.state_index().get("repo")["periodic_maintenance"] == periodic
+
+    # Switching maintenance off hands gc back to git
+    monkeypatch.setattr(multi_bot, "MAINTENANCE_ENABLED", False)
+    multi_bot.configure_checkout(repo, checkout_of(multi_bot))
+    assert git(checkout_of(multi_bot), "config", "--default", "unset", "gc.auto") == "unset"
@@ -0,0 +1,54 @@
+import json
+
+from metrics import MetricsRegistry, registry
+
+def _series_repos(name):
+    return {dict(labels).get("repo") for (metric, labels) in registry._counters if metric == name}
+
+def test_clone_is_counted_once_under_the_repository_name(multi_bot, monkeypatch):
+    monkeypatch.setattr(multi_bot, "CLONE_STRATEGY", {"shared": True})
+    registry.reset()
+    assert multi_bot.make_commit_for_repo(multi_bot.REPOSITORIES[0]) == "committed"
+
+    assert registry.counter_total("bot_subprocess_total", command="clone", repo="repo") == 1
+    assert registry.counter_total("bot_subprocess_total", command="fetch", repo="repo") == 1  # Shared store
+    assert _series_repos("bot_subprocess_total") == {"repo"}
+    assert len(registry.samples("bot_phase_duration_seconds", phase="clone")) == 1
+
+    registry.reset()
+    assert multi_bot.process_repo_isolated(multi_bot.REPOSITORIES[0]) == "committed"
+    assert registry.samples("bot_phase_duration_seconds", phase="clone") == []
+
+def test_prometheus_export(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.inc("bot_commits_total", repo='we"ird', status="committed")
+    metrics.inc("bot_commits_total", repo='we"ird', status="committed")
+    metrics.observe("bot_phase_duration_seconds", 0.2, phase="push", repo="r")
+    metrics.observe("bot_phase_duration_seconds", 7, phase="push", repo="r")
+    metrics.export(prometheus_path=str(tmp_path / "bot.prom"))
+
+    lines = (tmp_path / "bot.prom").read_text().splitlines()
+    assert "# TYPE bot_commits_total counter" in lines
+    assert 'bot_commits_total{repo="we\\"ird",status="committed"} 2' in lines
+    assert "# TYPE bot_phase_duration_seconds histogram" in lines
+    assert 'bot_phase_duration_seconds_bucket{phase="push",repo="r",le="0.25"} 1' in lines
+    assert 'bot_phase_duration_seconds_bucket{phase="push",repo="r",le="10.0"} 2' in lines
+    assert 'bot_phase_duration_seconds_bucket{phase="push",repo="r",le="+Inf"} 2' in lines
+    assert 'bot_phase_duration_seconds_sum{phase="push",repo="r"} 7.200000' in lines
+    assert 'bot_phase_duration_seconds_count{phase="push",repo="r"} 2' in lines
+
+def test_json_export(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.inc("bot_retries_total", repo="r", reason="push_rejected")
+    for value in (1, 2, 3, 4):
+        metrics.observe("bot_commit_latency_seconds", value, repo="r")
+    metrics.export(json_path=str(tmp_path / "bot.json"), extra={"cycle": {"committed": 1}})
+
+    data = json.loads((tmp_path / "bot.json").read_text())
+    assert data["cycle"] == {"committed": 1} and "generated_at" in data
+    assert data["counters"] == [
+        {"name": "bot_retries_total", "labels": {"reason": "push_rejected", "repo": "r"}, "value": 1},
+    ]
+    (histogram,) = data["histograms"]
+    assert (histogram["count"], histogram["sum"], histogram["max"]) == (4, 10, 4)
+    assert (histogram["p50"], histogram["p95"]) == (2, 4)
@@ -0,0 +1,166 @@
+import time
+
+from conftest import checkout_of, git
+from git_backend import count_unpushed, register_merge_drivers
+from push_batcher import PushBatcher
+from scheduler import DeadlineScheduler
+
+def test_is_due_by_size():
+    batcher = PushBatcher()
+    assert not batcher.is_due("r", max_commits=2)
+    batcher.record("r")
+    assert not batcher.is_due("r", max_commits=2)
+    batcher.record("r")
+    assert batcher.is_due("r", max_commits=2)
+    batcher.clear("r")
+    assert batcher.pending("r") == 0 and not batcher.is_due("r", max_commits=2)
+
+def test_is_due_by_window():
+    batcher = PushBatcher()
+    batcher.record("r")
+    assert not batcher.is_due("r", max_commits=10, max_age_seconds=60)
+    time.sleep(0.05)
+    assert batcher.is_due("r", max_commits=10, max_age_seconds=0.01)
+
+def test_seed_does_not_override_tracked_commits():
+    batcher = PushBatcher()
+    batcher.seed("r", 0)
+    assert batcher.pending_keys() == []
+    batcher.record("r")
+    batcher.seed("r", 5)
+    assert batcher.pending("r") == 1
+
+def test_seed_keeps_the_age_of_old_commits():
+    batcher = PushBatcher()
+    batcher.seed("r", 2, since=time.time() - 120)
+    assert batcher.is_due("r", max_commits=10, max_age_seconds=60)
+    assert batcher.flush_deadline("r", 60) < time.time()
+    assert batcher.flush_deadline("r") is None
+    assert batcher.flush_deadline("other", 60) is None
+
+def test_batch_size_defers_then_pushes_once(single_bot, remote, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 3)
+    remote_before = git(remote, "rev-parse", "main")
+
+    assert single_bot.make_commit() == "deferred"
+    assert single_bot.make_commit() == "deferred"
+    assert git(remote, "rev-parse", "main") == remote_before
+    assert count_unpushed(single_bot.REPO_PATH) == 2
+
+    assert single_bot.make_commit() == "committed"
+    assert git(remote, "rev-parse", "main") == git(single_bot.REPO_PATH, "rev-parse", "HEAD")
+    assert git(remote, "rev-list", "--count", f"{remote_before}..main") == "3"
+    assert single_bot._batcher.pending(single_bot.REPO_PATH) == 0
+
+def test_batch_rebases_over_concurrent_push(single_bot, remote, push_from_other, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 2)
+    register_merge_drivers(single_bot.REPO_PATH, single_bot.append_only_patterns())  # as main() does
+    assert single_bot.make_commit() == "deferred"
+    other_commit = push_from_other("commit_log.txt", "line from another machine")
+
+    assert single_bot.make_commit() == "committed"
+    head = git(single_bot.REPO_PATH, "rev-parse", "HEAD")
+    assert git(remote, "rev-parse", "main") == head
+    git(remote, "merge-base", "--is-ancestor", other_commit, head)
+    log = git(remote, "show", "main:commit_log.txt")
+    assert "line from another machine" in log and "<<<<<<<" not in log
+    assert log.count("Random Value") == 2
+    assert git(single_bot.REPO_PATH, "status", "--porcelain") == ""
+
+def test_batch_window_pushes_old_commits(single_bot, remote, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 10)
+    monkeypatch.setattr(single_bot, "BATCH_WINDOW_SECONDS", 0.2)
+    assert single_bot.make_commit() == "deferred"
+    time.sleep(0.3)
+    assert single_bot.make_commit() == "committed"
+    assert count_unpushed(single_bot.REPO_PATH) == 0
+
+def test_flush_pending_pushes_deferred_commits(single_bot, remote, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 5)
+    single_bot.make_commit()
+    single_bot.make_commit()
+    single_bot.flush_pending()
+    assert git(remote, "rev-parse", "main") == git(single_bot.REPO_PATH, "rev-parse", "HEAD")
+    assert single_bot._batcher.pending(single_bot.REPO_PATH) == 0
+
+def test_restart_seeds_unpushed_commits(single_bot, remote, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 3)
+    single_bot.make_commit()
+    single_bot.make_commit()
+
+    # A restarted bot only knows what @{upstream}..HEAD tells it
+    monkeypatch.setattr(single_bot, "_batcher", PushBatcher())
+    single_bot.seed_pending()
+    assert single_bot._batcher.pending(single_bot.REPO_PATH) == 2
+    assert single_bot.make_commit() == "committed"
+    assert count_unpushed(single_bot.REPO_PATH) == 0
+
+def test_count_unpushed_without_upstream(single_bot):
+    git(single_bot.REPO_PATH, "branch", "--unset-upstream")
+    assert count_unpushed(single_bot.REPO_PATH) == 0
+
+def test_multi_repo_batch_seed_and_flush(multi_bot, remote, monkeypatch):
+    monkeypatch.setattr(multi_bot, "BATCH_SIZE", 3)
+    repo = multi_bot.REPOSITORIES[0]
+    remote_before = git(remote, "rev-parse", "main")
+    assert multi_bot.make_commit_for_repo(repo) == "deferred"
+    assert multi_bot.make_commit_for_repo(repo) == "deferred"
+    assert git(remote, "rev-parse", "main") == remote_before
+
+    monkeypatch.setattr(multi_bot, "_batcher", PushBatcher())
+    multi_bot.seed_pending()
+    assert multi_bot._batcher.pending(repo["name"]) == 2
+
+    multi_bot.flush_pending()
+    assert git(remote, "rev-parse", "main") == git(checkout_of(multi_bot), "rev-parse", "HEAD")
+    assert git(remote, "rev-list", "--count", f"{remote_before}..main") == "2"
+
+def test_restart_seeds_the_window_from_the_committer_date(single_bot, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 10)
+    monkeypatch.setenv("GIT_COMMITTER_DATE", "2000-01-01T00:00:00+0000")
+    assert single_bot.make_commit() == "deferred"
+
+    monkeypatch.setattr(single_bot, "_batcher", PushBatcher())
+    single_bot.seed_pending()
+    assert single_bot._batcher.is_due(single_bot.REPO_PATH, 10, 3600)
+
+def test_window_expiry_pushes_without_a_new_commit(single_bot, remote, monkeypatch):
+    monkeypatch.setattr(single_bot, "BATCH_SIZE", 10)
+    monkeypatch.setattr(single_bot, "BATCH_WINDOW_SECONDS", 0.5)
+    monkeypatch.setattr(single_bot, "COMMIT_INTERVAL_SECONDS", 3600)
+    remote_before = git(remote, "rev-parse", "main")
+    real_wait = DeadlineScheduler.wait
+    seen = []
+
+    def wait(self, idle=None, wake_by=None):
+        if len(seen) == 2:
+            raise KeyboardInterrupt
+        started = time.monotonic()
+        keys = real_wait(self, idle, wake_by)
+        seen.append((keys, time.monotonic() - started, git(remote, "rev-parse", "main")))
+        return keys
+    monkeypatch.setattr(DeadlineScheduler, "wait", wait)
+
+    single_bot.main()
+    # First wake: the initial commit is due and deferred. Second wake: no commit is due
+    # for an hour, but the batch window ends the sleep and the commit is pushed
+    (first_keys, _, _), (second_keys, slept, _) = seen
+    assert first_keys == [single_bot.REPO_PATH] and second_keys == []
+    assert slept < 5
+    assert git(remote, "rev-list", "--count", f"{remote_before}..main") == "1"
+    assert single_bot._batcher.pending(single_bot.REPO_PATH) == 0
+
+def test_multi_repo_window_flush(multi_bot, remote, monkeypatch):
+    monkeypatch.setattr(multi_bot, "BATCH_SIZE", 10)
+    monkeypatch.setattr(multi_bot, "BATCH_WINDOW_SECONDS", 0.2)
+    repo = multi_bot.REPOSITORIES[0]
+    assert multi_bot.make_commit_for_repo(repo) == "deferred"
+    assert multi_bot.next_flush() > time.time()
+
+    multi_bot.flush_pending(due_only=True)  # Window still open
+    assert multi_bot._batcher.pending("repo") == 1
+    time.sleep(0.3)
+    assert multi_bot.next_flush() is None
+    multi_bot.flush_pending(due_only=True)
+    assert multi_bot._batcher.pending("repo") == 0
+    assert git(remote, "rev-parse", "main") == git(checkout_of(multi_bot), "rev-parse", "HEAD")
@@ -0,0 +1,56 @@
+import os
+import threading
+import time
+
+from conftest import git, url
+
+def test_failing_remote_does_not_affect_the_others(multi_bot, remote, tmp_path, monkeypatch):
+    good = {"url": url(remote), "name": "good", "dummy_file": "dummy_file_{}.txt"}
+    bad = {"url": url(tmp_path / "missing.git"), "name": "bad", "dummy_file": "dummy_file_{}.txt"}
+    monkeypatch.setattr(multi_bot, "REPOSITORIES", [good, bad])
+
+    summary = multi_bot.run_cycle([good, bad])
+    assert summary["results"] == {"good": "committed", "bad": "failed"}
+    assert summary["committed"] == 1 and summary["failed"] == 1
+    assert git(remote, "rev-parse", "main") == git(os.path.join(multi_bot.BASE_PATH, "good"), "rev-parse", "HEAD")
+    assert not os.path.exists(os.path.join(multi_bot.BASE_PATH, "bad"))
+
+def _fake_repos(multi_bot, count):
+    """Repositories with an existing checkout directory, so no clone is attempted."""
+    repos = [{"url": "unused", "name": f"repo{n}"} for n in range(count)]
+    for repo in repos:
+        os.makedirs(os.path.join(multi_bot.BASE_PATH, repo["name"]))
+    return repos
+
+def test_worker_count_respects_max_workers(multi_bot, monkeypatch):
+    repos = _fake_repos(multi_bot, 6)
+    running, peak = [0], [0]
+    guard = threading.Lock()
+
+    def make_commit_for_repo(repo):
+        with guard:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with guard:
+            running[0] -= 1
+        return "committed"
+    monkeypatch.setattr(multi_bot, "make_commit_for_repo", make_commit_for_repo)
+
+    summary = multi_bot.run_cycle(repos, max_workers=2)
+    assert summary["committed"] == 6
+    assert peak[0] == 2
+
+def test_repos_left_past_the_deadline_are_postponed(multi_bot, monkeypatch):
+    repos = _fake_repos(multi_bot, 2)
+    monkeypatch.setattr(multi_bot, "CYCLE_TIMEOUT_SECONDS", 0.1)
+
+    def make_commit_for_repo(repo):
+        time.sleep(0.3)  # Outlives the whole cycle budget
+        return "committed"
+    monkeypatch.setattr(multi_bot, "make_commit_for_repo", make_commit_for_repo)
+
+    summary = multi_bot.run_cycle(repos, max_workers=1)
+    assert summary["results"] == {"repo0": "committed", "repo1": "postponed"}
+    assert summary["postponed"] == 1
+    assert multi_bot.retry_delay("repo1", "postponed") == 0
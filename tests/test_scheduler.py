@@ -0,0 +1,75 @@
+import time
+
+from scheduler import CATCH_UP_SKIP, DeadlineScheduler
+
+def test_saved_deadline_survives_restart(tmp_path):
+    state = str(tmp_path / "schedule.json")
+    first = DeadlineScheduler(state)
+    first.add("repo", 3600)
+    first.pop_due()
+    due = first.complete("repo")
+
+    restarted = DeadlineScheduler(state)
+    restarted.add("repo", 3600)
+    assert restarted.next_due() == (due, "repo")
+
+def test_shortened_interval_applies_after_restart(tmp_path):
+    state = str(tmp_path / "schedule.json")
+    first = DeadlineScheduler(state)
+    first.add("repo", 6 * 3600)
+    first.pop_due()
+    first.complete("repo")
+    last_run = first._jobs["repo"]["last_run"]
+
+    restarted = DeadlineScheduler(state)
+    restarted.add("repo", 600)
+    assert restarted.next_due() == (last_run + 600, "repo")
+
+def test_lengthened_interval_keeps_saved_deadline(tmp_path):
+    state = str(tmp_path / "schedule.json")
+    first = DeadlineScheduler(state)
+    first.add("repo", 600)
+    first.pop_due()
+    due = first.complete("repo")
+
+    restarted = DeadlineScheduler(state)
+    restarted.add("repo", 6 * 3600)
+    assert restarted.next_due() == (due, "repo")
+
+def test_skip_policy_moves_missed_deadline_forward(tmp_path):
+    scheduler = DeadlineScheduler(str(tmp_path / "schedule.json"), CATCH_UP_SKIP)
+    now = time.time()
+    scheduler.add("repo", 100, first_due=now - 250)
+    due, _ = scheduler.next_due()
+    assert now <= due <= now + 100
+
+def test_wait_wakes_early_for_wake_by(tmp_path):
+    scheduler = DeadlineScheduler(str(tmp_path / "schedule.json"))
+    scheduler.add("repo", 3600, first_due=time.time() + 3600)
+    idle_until = []
+    started = time.monotonic()
+    assert scheduler.wait(idle=idle_until.append, wake_by=time.time() + 0.1) == []
+    assert time.monotonic() - started < 1
+    assert idle_until and idle_until[0] < time.time() + 1
+    assert scheduler.next_due()[1] == "repo"
+
+def test_bot_main_loop_survives_errors_outside_run_once(single_bot, monkeypatch):
+    outcomes = [OSError("state file not writable"), KeyboardInterrupt()]
+
+    def wait(self, idle=None, wake_by=None):
+        raise outcomes.pop(0)
+    sleeps = []
+    real_sleep = time.sleep
+
+    def sleep(seconds):
+        # Record the main loop's backoff; let the log writer's short polls through
+        if seconds < 1:
+            return real_sleep(seconds)
+        sleeps.append(seconds)
+    monkeypatch.setattr(DeadlineScheduler, "wait", wait)
+    monkeypatch.setattr(time, "sleep", sleep)
+
+    single_bot.main()
+    assert outcomes == []
+    assert len(sleeps) == 1
+    assert single_bot._retry.failures("main loop") == 1
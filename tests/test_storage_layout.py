@@ -0,0 +1,54 @@
+import pytest
+
+from conftest import git
+from storage_layout import migrate_repo
+
+LOG_LINES = [
+    "2024-01-05 10:00:00 - Random Value: 1111\n",
+    "<<<<<<< Updated upstream\n",
+    "2024-01-05 11:00:00 - Random Value: 2222\n",
+    "=======\n",
+    "2024-02-01 09:30:00 - Random Value: 3333\n",
+    ">>>>>>> Stashed changes\n",
+]
+
+@pytest.fixture
+def repo_with_log(make_clone):
+    clone = make_clone()
+    (clone / "commit_log.txt").write_text("".join(LOG_LINES))
+    (clone / "dummy_file_20240105100000.txt").write_text("run one\n")
+    git(clone, "add", "commit_log.txt", "dummy_file_20240105100000.txt")
+    git(clone, "commit", "--quiet", "-m", "Bot history")
+    return clone
+
+def test_migration_commits_only_bot_files(repo_with_log):
+    clone = repo_with_log
+    (clone / "notes_local.txt").write_text("unrelated and untracked\n")
+    (clone / "README").write_text("edited by hand\n")
+
+    migrate_repo(str(clone), ["commit_log.txt", "dummy_file_{}.txt"])
+
+    committed = git(clone, "show", "--name-status", "--format=", "HEAD").splitlines()
+    assert all("commit_log" in line or "dummy_file" in line for line in committed)
+    assert "D\tcommit_log.txt" in committed
+    assert "A\tcommit_log/2024/01/05-000.txt" in committed
+    assert "A\tcommit_log/2024/02/01-000.txt" in committed
+    # The user's own changes are still there, uncommitted
+    status = git(clone, "status", "--porcelain")
+    assert "M README" in status and "?? notes_local.txt" in status
+
+    january = git(clone, "show", "HEAD:commit_log/2024/01/05-000.txt")
+    assert "1111" in january and "2222" in january
+    assert not any(marker in january for marker in ("<<<<<<<", "=======", ">>>>>>>"))
+    assert "3333" in git(clone, "show", "HEAD:commit_log/2024/02/01-000.txt")
+
+def test_migration_refuses_dirty_bot_files(repo_with_log):
+    clone = repo_with_log
+    with open(clone / "commit_log.txt", "a", encoding="utf-8") as f:
+        f.write("2024-03-01 00:00:00 - uncommitted\n")
+    head = git(clone, "rev-parse", "HEAD")
+
+    with pytest.raises(RuntimeError, match="commit_log.txt"):
+        migrate_repo(str(clone), ["commit_log.txt"])
+    assert git(clone, "rev-parse", "HEAD") == head
+    assert (clone / "commit_log.txt").exists()
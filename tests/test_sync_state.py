@@ -0,0 +1,44 @@
+from conftest import checkout_of, git
+from git_backend import remote_tip
+from metrics import registry
+
+def _count(command, repo):
+    return registry.counter_total("bot_subprocess_total", command=command, repo=repo)
+
+def test_remote_tip_reads_the_remote_not_the_tracking_ref(single_bot, remote, push_from_other):
+    assert remote_tip(single_bot.REPO_PATH) == git(remote, "rev-parse", "main")
+    moved = push_from_other("other.txt", "moved")
+    assert git(single_bot.REPO_PATH, "rev-parse", "@{upstream}") != moved
+    assert remote_tip(single_bot.REPO_PATH) == moved
+
+def test_remote_tip_without_upstream(single_bot):
+    git(single_bot.REPO_PATH, "branch", "--unset-upstream")
+    assert remote_tip(single_bot.REPO_PATH) is None
+
+def test_bot2_skips_pull_only_while_remote_is_unchanged(multi_bot, push_from_other):
+    repo = multi_bot.REPOSITORIES[0]
+    registry.reset()
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert _count("pull", "repo") == 1  # Nothing cached yet
+
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert _count("pull", "repo") == 1
+
+    push_from_other("other.txt", "moved")
+    assert multi_bot.make_commit_for_repo(repo) == "committed"
+    assert _count("pull", "repo") == 2
+    assert registry.counter_total("bot_retries_total", reason="push_rejected") == 0
+    assert git(checkout_of(multi_bot), "status", "--porcelain") == ""
+
+def test_bot_pushes_optimistically_and_retries_once_when_remote_moved(single_bot, remote, push_from_other):
+    registry.reset()
+    assert single_bot.make_commit() == "committed"
+    assert _count("ls-remote", "clone") == 0
+    assert _count("pull", "clone") == 0
+    push_from_other("other.txt", "moved")
+
+    assert single_bot.make_commit() == "committed"
+    assert registry.counter_total("bot_retries_total", reason="push_rejected") == 1
+    assert _count("pull", "clone") == 1
+    assert _count("ls-remote", "clone") == 0
+    assert git(remote, "rev-parse", "main") == git(single_bot.REPO_PATH, "rev-parse", "HEAD")